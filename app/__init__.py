@@ -1,23 +1,38 @@
 from flask import Flask
 from config import Config
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_login import LoginManager
 from flask_moment import Moment
-import logging
+from app.database import engine_options, configure_sqlite
+from app.logs import configure_logging
+import os
 
-from flask_admin import Admin
-from flask_admin.contrib.sqla import ModelView
 
-from logging.handlers import RotatingFileHandler
-import os
+def enabled(name, default=True):
+    value = application.config.get(name, os.environ.get(name))
+    if value is None:
+        return default
+    if isinstance(value, str):
+        return value.strip().lower() not in ('0', 'false', 'no', 'off', '')
+    return bool(value)
+
 
 application = Flask(__name__)
 
 application.config.from_object(Config)
+application.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(application.config))
+application.config.setdefault('MAX_CONTENT_LENGTH', 16 * 1024 * 1024)
 
 db = SQLAlchemy(application)
-migrate = Migrate(application, db)
+
+with application.app_context():
+    if db.engine.dialect.name == 'sqlite':
+        configure_sqlite(db.engine, application.config)
+
+migrate = None
+if enabled('MIGRATE_ENABLED'):
+    from flask_migrate import Migrate
+    migrate = Migrate(application, db)
 
 login = LoginManager(application)
 login.login_view = 'login'
@@ -25,68 +40,29 @@ login.login_view = 'login'
 moment = Moment(application)
 
 if not application.debug:
-    if not os.path.exists('logs'):
-        os.mkdir('logs')
-    file_handler = RotatingFileHandler('logs/microblog.log', maxBytes=10240, backupCount=10)
-    file_handler.setFormatter(logging.Formatter( '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'))
-    file_handler.setLevel(logging.INFO)
-    application.logger.addHandler(file_handler)
-
-    application.logger.setLevel(logging.INFO)
+    configure_logging(application)
     application.logger.info('Microblog startup')
 
-from app import routes, models, errors
-from app.models import User, ReviewsMessage, ForumTopic, CommentTopic, MyProjects
-from app.forms import MyProjectsForm
-from flask import render_template, redirect, url_for, request
-from flask_login import current_user
-
-admin = Admin(application, url='/admin', name='Моя Админка', template_mode='bootstrap3') 
-
-class SecureModelView(ModelView):
-    def is_accessible(self):
-        return current_user.is_authenticated and current_user.is_admin
-
-    def inaccessible_callback(self, name, **kwargs):
-        return redirect(url_for('login', next=request.url))
-
-    column_exclude_list = ['password_hash', 'avatar_data']
-    form_excluded_columns = [
-        'password_hash',
-        'avatar_data',  
-        'followed',    
-        'followers',    
-        'reviews',      
-        'topics',      
-        'comments'      
-    ]
-
-    form_columns = [
-        'is_admin',
-        'is_banned'
-    ]
-
-
-class OtherModelView(ModelView):
-    def is_accessible(self):
-        return current_user.is_authenticated and current_user.is_admin
-
-    def inaccessible_callback(self, name, **kwargs):
-        return redirect(url_for('login', next=request.url))
+from app.templating import init_templating
+format_datetime = init_templating(application, preload=enabled('TEMPLATE_PRELOAD'))
 
+from app import routes, models, identity, errors, counters, cli
 
-class MyProjectsModelView(ModelView):
-    form = MyProjectsForm
+if enabled('AVATAR_WARM_DEFAULTS', False):
+    from app.avatars import warm_default_avatars
+    warm_default_avatars()
 
-    def is_accessible(self):
-        return current_user.is_authenticated and current_user.is_admin
+if application.config.get('INSTRUMENTATION_ENABLED'):
+    from app.instrumentation import init_instrumentation
+    init_instrumentation(application)
 
-    def inaccessible_callback(self, name, **kwargs):
-        return redirect(url_for('login', next=request.url))
+from app.http_cache import init_http_cache
+init_http_cache(application)
 
-admin.add_view(SecureModelView(User, db.session))
-admin.add_view(OtherModelView(ForumTopic, db.session))
-admin.add_view(OtherModelView(CommentTopic, db.session))
-admin.add_view(OtherModelView(ReviewsMessage, db.session))
-admin.add_view(MyProjectsModelView(MyProjects, db.session))
+if enabled('API_ENABLED'):
+    from app.api import api
+    application.register_blueprint(api)
 
+if enabled('ADMIN_ENABLED'):
+    from app.admin import init_admin
+    init_admin(application)
@@ -0,0 +1,172 @@
+from app import application, db
+from app.models import User, ReviewsMessage, ForumTopic, CommentTopic, MyProjects
+from app.forms import MyProjectsForm
+from app.cache import LRUCache
+from app import moderation
+from flask import redirect, url_for, request, flash, g
+from flask_admin import Admin
+from flask_admin.actions import action
+from flask_admin.contrib.sqla import ModelView
+from flask_login import current_user
+import sqlalchemy as sa
+import sqlalchemy.orm as so
+
+admin_counts = LRUCache(maxsize=64, ttl=application.config.get('ADMIN_COUNT_TTL', 60))
+
+
+class ScalableModelView(ModelView):
+    page_size = 50
+    column_auto_select_related = False
+    list_options = ()
+
+    def get_query(self):
+        return super().get_query().options(*self.list_options)
+
+    def get_count_query(self):
+        if g.pop('admin_cached_count', False):
+            return None
+        return super().get_count_query()
+
+    def get_list(self, page, sort_column, sort_desc, search, filters, execute=True, page_size=None):
+        if search or filters:
+            return super().get_list(page, sort_column, sort_desc, search, filters, execute, page_size)
+
+        g.admin_cached_count = True
+        _, query = super().get_list(page, sort_column, sort_desc, search, filters, execute, page_size)
+        return self.cached_count(), query
+
+    def cached_count(self):
+        count = admin_counts.get(self.model.__name__)
+        if count is None:
+            count = self.estimate_count()
+            admin_counts.set(self.model.__name__, count)
+        return count
+
+    def estimate_count(self):
+        table = self.model.__table__
+        if self.session.get_bind().dialect.name == 'postgresql':
+            estimate = self.session.scalar(
+                sa.text('SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:name AS regclass)'),
+                {'name': table.name}
+            )
+            if estimate and estimate >= application.config.get('ADMIN_EXACT_COUNT_LIMIT', 100000):
+                return estimate
+
+        return self.session.scalar(sa.select(sa.func.count()).select_from(table))
+
+    def reset_count(self):
+        admin_counts.delete(self.model.__name__)
+
+    def after_model_change(self, form, model, is_created):
+        if is_created:
+            self.reset_count()
+
+    def after_model_delete(self, model):
+        self.reset_count()
+
+    def is_accessible(self):
+        return current_user.is_authenticated and current_user.is_admin
+
+    def inaccessible_callback(self, name, **kwargs):
+        return redirect(url_for('login', next=request.url))
+
+
+def _short(limit):
+    return lambda view, context, model, name: (getattr(model, name) or '')[:limit]
+
+
+class SecureModelView(ScalableModelView):
+    column_list = ['id', 'username', 'email', 'is_admin', 'is_banned', 'last_seen', 'followers_count']
+    column_sortable_list = ['id', 'username', 'email']
+    column_default_sort = ('id', True)
+    list_options = (so.load_only(User.id, User.username, User.email, User.is_admin, User.is_banned,
+                                 User.last_seen, User.followers_count),)
+
+    form_excluded_columns = [
+        'password_hash',
+        'avatar_data',  
+        'avatar_etag',
+        'followed',    
+        'followers',    
+        'reviews',      
+        'topics',      
+        'comments'      
+    ]
+
+    form_columns = [
+        'is_admin',
+        'is_banned'
+    ]
+
+    def _ids(self, ids):
+        return [int(id) for id in ids]
+
+    @action('ban', 'Заблокировать', 'Заблокировать выбранных пользователей?')
+    def action_ban(self, ids):
+        count = moderation.set_banned(self._ids(ids), True)
+        flash(f'Заблокировано пользователей: {count}', 'success')
+
+    @action('unban', 'Разблокировать', 'Разблокировать выбранных пользователей?')
+    def action_unban(self, ids):
+        count = moderation.set_banned(self._ids(ids), False)
+        flash(f'Разблокировано пользователей: {count}', 'success')
+
+
+class OtherModelView(ScalableModelView):
+    form_excluded_columns = ['comment_count', 'last_activity_at']
+    column_default_sort = ('timestamp', True)
+
+
+class ForumTopicModelView(OtherModelView):
+    column_list = ['id', 'title', 'author', 'timestamp', 'comment_count', 'last_activity_at']
+    column_sortable_list = ['id', 'title', 'timestamp', 'last_activity_at']
+    list_options = (
+        so.load_only(ForumTopic.id, ForumTopic.title, ForumTopic.timestamp, ForumTopic.user_id,
+                     ForumTopic.comment_count, ForumTopic.last_activity_at),
+        so.joinedload(ForumTopic.author).load_only(User.id, User.username),
+    )
+
+    @action('delete', 'Удалить', 'Удалить выбранные темы вместе с комментариями?')
+    def action_delete(self, ids):
+        count = moderation.delete_topics([int(id) for id in ids])
+        self.reset_count()
+        admin_counts.delete(CommentTopic.__name__)
+        flash(f'Удалено тем: {count}', 'success')
+
+
+class CommentTopicModelView(OtherModelView):
+    column_list = ['id', 'topic', 'author', 'body', 'timestamp']
+    column_sortable_list = ['id', 'timestamp']
+    column_formatters = {'body': _short(100)}
+    list_options = (
+        so.joinedload(CommentTopic.topic).load_only(ForumTopic.id, ForumTopic.title),
+        so.joinedload(CommentTopic.author).load_only(User.id, User.username),
+    )
+
+    @action('delete', 'Удалить', 'Удалить выбранные комментарии?')
+    def action_delete(self, ids):
+        count = moderation.delete_comments([int(id) for id in ids])
+        self.reset_count()
+        flash(f'Удалено комментариев: {count}', 'success')
+
+
+class ReviewsMessageModelView(OtherModelView):
+    column_list = ['id', 'author', 'username_message', 'body', 'timestamp']
+    column_sortable_list = ['id', 'timestamp']
+    list_options = (so.joinedload(ReviewsMessage.author).load_only(User.id, User.username),)
+
+
+class MyProjectsModelView(ScalableModelView):
+    form = MyProjectsForm
+    column_default_sort = 'name'
+
+
+
+def init_admin(app):
+    admin = Admin(app, url='/admin', name='Моя Админка', template_mode='bootstrap3')
+    admin.add_view(SecureModelView(User, db.session))
+    admin.add_view(ForumTopicModelView(ForumTopic, db.session))
+    admin.add_view(CommentTopicModelView(CommentTopic, db.session))
+    admin.add_view(ReviewsMessageModelView(ReviewsMessage, db.session))
+    admin.add_view(MyProjectsModelView(MyProjects, db.session))
+    return admin
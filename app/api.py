@@ -0,0 +1,218 @@
+from datetime import timezone
+import json
+import sqlalchemy as sa
+import sqlalchemy.orm as so
+from flask import Blueprint, request, make_response, current_app
+from flask_login import current_user
+from app import db
+from app.models import User, ForumTopic, CommentTopic, ReviewsMessage
+from app.pagination import paginate_keyset
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+
+
+def _json(payload, status=200):
+    response = make_response(_dumps(payload), status)
+    response.mimetype = 'application/json'
+    if status == 200 and request.method in ('GET', 'HEAD'):
+        response.add_etag(weak=True)
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        response.make_conditional(request)
+    return response
+
+
+def _iso(value):
+    if value is None:
+        return None
+    return value.replace(tzinfo=value.tzinfo or timezone.utc).isoformat()
+
+
+def _author(obj):
+    return {'id': obj.author.id, 'username': obj.author.username}
+
+
+class Resource:
+    def __init__(self, model, fields, relations=None, default=None):
+        self.model = model
+        self.fields = fields
+        self.relations = relations or {}
+        self.default = default or list(fields)
+
+    def selected(self):
+        raw = request.args.get('fields')
+        if not raw:
+            return self.default
+
+        names = [name.strip() for name in raw.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ApiError(400, f"Неизвестные поля: {', '.join(unknown)}")
+        return names
+
+    def options(self, names, extra=()):
+        columns = {self.model.id, *extra}
+        options = []
+        for name in names:
+            columns.update(self.fields[name][0])
+            if name in self.relations:
+                options.append(self.relations[name])
+        return [so.load_only(*columns)] + options
+
+    def query(self, names, extra=()):
+        return sa.select(self.model).options(*self.options(names, extra))
+
+    def serialize(self, obj, names):
+        return {name: self.fields[name][1](obj) for name in names}
+
+
+users = Resource(User, {
+    'id': ((User.id,), lambda user: user.id),
+    'username': ((User.username,), lambda user: user.username),
+    'about_me': ((User.about_me,), lambda user: user.about_me),
+    'last_seen': ((User.last_seen,), lambda user: _iso(user.last_seen)),
+    'avatar': ((User.avatar_etag,), lambda user: user.avatar(128)),
+    'followers_count': ((User.followers_count,), lambda user: user.followers_count),
+    'following_count': ((User.following_count,), lambda user: user.following_count),
+})
+
+topics = Resource(ForumTopic, {
+    'id': ((ForumTopic.id,), lambda topic: topic.id),
+    'title': ((ForumTopic.title,), lambda topic: topic.title),
+    'body': ((ForumTopic.body,), lambda topic: topic.body),
+    'author': ((ForumTopic.user_id,), _author),
+    'timestamp': ((ForumTopic.timestamp,), lambda topic: _iso(topic.timestamp)),
+    'last_activity_at': ((ForumTopic.last_activity_at,), lambda topic: _iso(topic.last_activity_at)),
+    'comment_count': ((ForumTopic.comment_count,), lambda topic: topic.comment_count),
+}, relations={
+    'author': so.joinedload(ForumTopic.author).load_only(User.id, User.username),
+}, default=['id', 'title', 'author', 'timestamp', 'last_activity_at', 'comment_count'])
+
+comments = Resource(CommentTopic, {
+    'id': ((CommentTopic.id,), lambda comment: comment.id),
+    'topic_id': ((CommentTopic.topic_id,), lambda comment: comment.topic_id),
+    'body': ((CommentTopic.body,), lambda comment: comment.body),
+    'author': ((CommentTopic.user_id,), _author),
+    'timestamp': ((CommentTopic.timestamp,), lambda comment: _iso(comment.timestamp)),
+}, relations={
+    'author': so.joinedload(CommentTopic.author).load_only(User.id, User.username),
+})
+
+reviews = Resource(ReviewsMessage, {
+    'id': ((ReviewsMessage.id,), lambda review: review.id),
+    'body': ((ReviewsMessage.body,), lambda review: review.body),
+    'username': ((ReviewsMessage.username_message,), lambda review: review.username_message),
+    'author': ((ReviewsMessage.user_id,), _author),
+    'timestamp': ((ReviewsMessage.timestamp,), lambda review: _iso(review.timestamp)),
+}, relations={
+    'author': so.joinedload(ReviewsMessage.author).load_only(User.id, User.username),
+})
+
+
+def _per_page():
+    limit = current_app.config.get('API_MAX_PER_PAGE', 100)
+    try:
+        per_page = int(request.args.get('per_page', 20))
+    except ValueError:
+        raise ApiError(400, 'per_page должен быть числом')
+    return max(1, min(per_page, limit))
+
+
+def _ids():
+    limit = current_app.config.get('API_MAX_IDS', 100)
+    try:
+        ids = list(dict.fromkeys(int(value) for value in request.args['ids'].split(',') if value.strip()))
+    except ValueError:
+        raise ApiError(400, 'ids должен быть списком чисел через запятую')
+    if len(ids) > limit:
+        raise ApiError(400, f'Не больше {limit} идентификаторов за запрос')
+    return ids
+
+
+def _batch(resource):
+    names = resource.selected()
+    ids = _ids()
+    found = {obj.id: obj for obj in db.session.scalars(resource.query(names).where(resource.model.id.in_(ids)))} \
+        if ids else {}
+    return _json({
+        'items': [resource.serialize(found[id], names) for id in ids if id in found],
+        'missing': [id for id in ids if id not in found],
+    })
+
+
+def _page(resource, query, timestamp_column, names, descending=True):
+    page = paginate_keyset(
+        query, timestamp_column, resource.model.id,
+        per_page=_per_page(),
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        descending=descending
+    )
+    return _json({
+        'items': [resource.serialize(obj, names) for obj in page],
+        'next': page.next_cursor,
+        'prev': page.prev_cursor,
+    })
+
+
+@api.errorhandler(ApiError)
+def api_error(error):
+    return _json({'error': error.message}, error.status)
+
+
+@api.before_request
+def require_login():
+    if not current_user.is_authenticated:
+        return _json({'error': 'Требуется авторизация'}, 401)
+
+
+@api.route('/users')
+def user_list():
+    if 'ids' not in request.args:
+        raise ApiError(400, 'Параметр ids обязателен')
+    return _batch(users)
+
+
+@api.route('/topics')
+def topic_list():
+    if 'ids' in request.args:
+        return _batch(topics)
+
+    names = topics.selected()
+    timestamp_column = ForumTopic.last_activity_at if request.args.get('sort') == 'activity' else ForumTopic.timestamp
+    return _page(topics, topics.query(names, extra=(timestamp_column,)), timestamp_column, names)
+
+
+@api.route('/topics/<int:topic_id>/comments')
+def topic_comments(topic_id):
+    if db.session.scalar(sa.select(ForumTopic.id).where(ForumTopic.id == topic_id)) is None:
+        raise ApiError(404, 'Тема не найдена')
+
+    names = comments.selected()
+    query = comments.query(names, extra=(CommentTopic.timestamp,)).where(CommentTopic.topic_id == topic_id)
+    return _page(comments, query, CommentTopic.timestamp, names, descending=False)
+
+
+@api.route('/reviews')
+def review_list():
+    names = reviews.selected()
+    return _page(reviews, reviews.query(names, extra=(ReviewsMessage.timestamp,)), ReviewsMessage.timestamp, names)
@@ -0,0 +1,89 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import math
+import threading
+import time
+from werkzeug.exceptions import TooManyRequests, ServiceUnavailable
+from werkzeug.security import check_password_hash, generate_password_hash
+from app import application
+
+
+class TokenBucketLimiter:
+    def __init__(self, per_minute, burst, maxsize=10000):
+        self.rate = per_minute / 60
+        self.burst = burst
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+
+        if allowed:
+            return 0
+        return math.ceil((1 - tokens) / self.rate)
+
+
+ip_limiter = TokenBucketLimiter(
+    per_minute=application.config.get('LOGIN_IP_RATE', 20),
+    burst=application.config.get('LOGIN_IP_BURST', 10)
+)
+username_limiter = TokenBucketLimiter(
+    per_minute=application.config.get('LOGIN_USERNAME_RATE', 5),
+    burst=application.config.get('LOGIN_USERNAME_BURST', 5)
+)
+
+
+def throttle_login(remote_addr, username=None):
+    if not application.config.get('LOGIN_THROTTLE_ENABLED', True):
+        return
+
+    retry_after = ip_limiter.consume(remote_addr)
+    if not retry_after and username:
+        retry_after = username_limiter.consume(username.strip().lower())
+    if retry_after:
+        raise TooManyRequests(retry_after=retry_after)
+
+
+PASSWORD_HASH_METHOD = application.config.get('PASSWORD_HASH_METHOD', 'scrypt')
+PASSWORD_HASH_CONCURRENCY = application.config.get('PASSWORD_HASH_CONCURRENCY', 2)
+
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_CONCURRENCY, thread_name_prefix='password')
+_hash_slots = threading.BoundedSemaphore(PASSWORD_HASH_CONCURRENCY + application.config.get('PASSWORD_HASH_QUEUE', 8))
+_hash_prefix = None
+
+
+def _run_hashing(function, *args):
+    if not _hash_slots.acquire(timeout=application.config.get('PASSWORD_HASH_WAIT', 5)):
+        raise ServiceUnavailable(retry_after=1)
+
+    try:
+        return _hash_executor.submit(function, *args).result()
+    finally:
+        _hash_slots.release()
+
+
+def hash_password(password):
+    return _run_hashing(generate_password_hash, password, PASSWORD_HASH_METHOD)
+
+
+def verify_password(password_hash, password):
+    if not password_hash:
+        return False
+    return _run_hashing(check_password_hash, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    global _hash_prefix
+    if _hash_prefix is None:
+        _hash_prefix = generate_password_hash('', PASSWORD_HASH_METHOD).split('$', 1)[0]
+    return password_hash.split('$', 1)[0] != _hash_prefix
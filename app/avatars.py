@@ -0,0 +1,308 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import hashlib
+import io
+import os
+import threading
+import sqlalchemy as sa
+import sqlalchemy.orm as so
+from app import application, db
+from app.cache import LRUCache
+from app.models import User, AvatarThumbnail, AvatarJob, DEFAULT_AVATAR_FILES
+
+
+AVATAR_SIZES = (32, 128)
+AVATAR_MAX_DIMENSION = application.config.get('AVATAR_MAX_DIMENSION', 512)
+AVATAR_MAX_PIXELS = application.config.get('AVATAR_MAX_PIXELS', 40_000_000)
+AVATAR_FORMAT = application.config.get('AVATAR_FORMAT')
+AVATAR_INPUT_FORMATS = ('JPEG', 'PNG', 'WEBP', 'GIF')
+AVATAR_JOB_MAX_ATTEMPTS = 3
+LEGACY_AVATAR_VERSION = 'legacy'
+AVATAR_JOB_STALE_AFTER = timedelta(seconds=application.config.get('AVATAR_JOB_STALE_SECONDS', 600))
+
+SAVE_OPTIONS = {
+    'WEBP': {'quality': 85, 'method': 4},
+    'JPEG': {'quality': 85, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+}
+MIMETYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg', 'PNG': 'image/png'}
+
+Thumbnail = namedtuple('Thumbnail', ['data', 'mimetype', 'etag'])
+
+thumbnail_cache = LRUCache(maxsize=application.config.get('AVATAR_CACHE_SIZE', 1024))
+
+
+def avatar_format():
+    global AVATAR_FORMAT
+    if AVATAR_FORMAT is None:
+        from PIL import features
+        AVATAR_FORMAT = 'WEBP' if features.check('webp') else 'JPEG'
+    return AVATAR_FORMAT
+
+
+def _encode(image):
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+    image.info = {}
+
+    image_format = avatar_format()
+    if image_format == 'JPEG' and has_alpha:
+        image_format = 'PNG'
+
+    output_stream = io.BytesIO()
+    image.save(output_stream, format=image_format, **SAVE_OPTIONS[image_format])
+    return output_stream.getvalue(), MIMETYPES[image_format]
+
+
+def render_thumbnail(data, size):
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data))
+    image.thumbnail((size, size), Image.LANCZOS)
+    return _encode(image)
+
+
+def probe_avatar(data):
+    from PIL import Image
+
+    try:
+        image = Image.open(io.BytesIO(data))
+    except Exception:
+        raise ValueError('Файл не является изображением')
+
+    if image.format not in AVATAR_INPUT_FORMATS:
+        raise ValueError(f'Формат {image.format} не поддерживается')
+    if image.width * image.height > AVATAR_MAX_PIXELS:
+        raise ValueError('Слишком большое изображение')
+
+
+def normalize_avatar(data):
+    from PIL import Image, ImageOps
+
+    probe_avatar(data)
+    with Image.open(io.BytesIO(data)) as image:
+        image.verify()
+
+    image = Image.open(io.BytesIO(data))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((AVATAR_MAX_DIMENSION, AVATAR_MAX_DIMENSION), Image.LANCZOS)
+    payload, _ = _encode(image)
+    return payload
+
+
+def store_thumbnails(user, data):
+    version = hashlib.sha1(data).hexdigest()
+    thumbnails = []
+    for size in AVATAR_SIZES:
+        payload, mimetype = render_thumbnail(data, size)
+        thumbnails.append(AvatarThumbnail(user_id=user.id, size=size, data=payload,
+                                          mimetype=mimetype, etag=f'{version}-{size}'))
+
+    db.session.execute(sa.delete(AvatarThumbnail).where(AvatarThumbnail.user_id == user.id))
+    db.session.add_all(thumbnails)
+
+    user.avatar_data = data
+    user.avatar_etag = version
+
+
+default_avatars = {}
+
+
+def _render_default_avatar(size):
+    from PIL import Image
+
+    filename = DEFAULT_AVATAR_FILES.get(size, DEFAULT_AVATAR_FILES[max(AVATAR_SIZES)])
+    with open(os.path.join(application.static_folder, filename), 'rb') as f:
+        data = f.read()
+
+    image = Image.open(io.BytesIO(data))
+    if image.size == (size, size) and image.format == 'JPEG':
+        return Thumbnail(data, 'image/jpeg', f'default-{size}')
+
+    payload, mimetype = render_thumbnail(data, size)
+    return Thumbnail(payload, mimetype, f'default-{size}')
+
+
+def warm_default_avatars():
+    for size in AVATAR_SIZES:
+        default_avatars[size] = _render_default_avatar(size)
+
+
+def default_thumbnail(size):
+    thumbnail = default_avatars.get(size)
+    if thumbnail is None:
+        thumbnail = default_avatars[size] = _render_default_avatar(size)
+    return thumbnail
+
+
+def get_thumbnail(user_id, size, version=None):
+    if version:
+        thumbnail = thumbnail_cache.get((user_id, size, version))
+        if thumbnail is not None:
+            return thumbnail
+
+    row = db.session.get(AvatarThumbnail, (user_id, size))
+    if row is None:
+        row = _rebuild_thumbnails(user_id, size)
+        if row is None:
+            return default_thumbnail(size)
+
+    thumbnail = Thumbnail(row.data, row.mimetype, row.etag)
+    thumbnail_cache.set((user_id, size, row.etag.rsplit('-', 1)[0]), thumbnail)
+    return thumbnail
+
+
+def load_avatar_owner(user_id):
+    return db.session.get(User, user_id, options=[so.undefer(User.avatar_data)])
+
+
+def _rebuild_thumbnails(user_id, size):
+    user = load_avatar_owner(user_id)
+    if user is None or not user.avatar_data:
+        return None
+
+    try:
+        store_thumbnails(user, user.avatar_data)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        application.logger.warning(f'Ошибка при обработке аватара пользователя {user_id}: {e}')
+        return None
+
+    return db.session.get(AvatarThumbnail, (user_id, size))
+
+
+def mark_legacy_avatars():
+    marked = db.session.execute(
+        sa.update(User)
+        .where(User.avatar_etag.is_(None), User.avatar_data.is_not(None))
+        .values(avatar_etag=LEGACY_AVATAR_VERSION)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return marked
+
+
+def enqueue_avatar(user, data):
+    probe_avatar(data)
+    db.session.execute(
+        sa.update(AvatarJob)
+        .where(AvatarJob.user_id == user.id, AvatarJob.status == 'pending')
+        .values(status='superseded', data=None)
+    )
+    job = AvatarJob(user_id=user.id, data=data)
+    db.session.add(job)
+    return job
+
+
+def has_pending_avatar(user_id):
+    return db.session.scalar(
+        sa.select(AvatarJob.id)
+        .where(AvatarJob.user_id == user_id, AvatarJob.status.in_(('pending', 'processing')))
+        .limit(1)
+    ) is not None
+
+
+def _claimable():
+    stale_before = datetime.now(timezone.utc) - AVATAR_JOB_STALE_AFTER
+    return sa.and_(
+        AvatarJob.attempts < AVATAR_JOB_MAX_ATTEMPTS,
+        sa.or_(AvatarJob.status == 'pending',
+               sa.and_(AvatarJob.status == 'processing',
+                       sa.or_(AvatarJob.claimed_at.is_(None), AvatarJob.claimed_at < stale_before)))
+    )
+
+
+def pending_avatar_jobs():
+    return db.session.scalars(sa.select(AvatarJob.id).where(_claimable()).order_by(AvatarJob.id)).all()
+
+
+def _claim(job_id):
+    claimed = db.session.execute(
+        sa.update(AvatarJob)
+        .where(AvatarJob.id == job_id, _claimable())
+        .values(status='processing', attempts=AvatarJob.attempts + 1, claimed_at=datetime.now(timezone.utc))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return claimed == 1
+
+
+def _finish(job, status, error=None):
+    job.status = status
+    job.error = error
+    job.data = None
+    job.finished_at = datetime.now(timezone.utc)
+
+
+def process_avatar_job(job_id):
+    if not _claim(job_id):
+        return False
+
+    job = db.session.get(AvatarJob, job_id, options=[so.undefer(AvatarJob.data)], populate_existing=True)
+    try:
+        superseded = db.session.scalar(
+            sa.select(AvatarJob.id)
+            .where(AvatarJob.user_id == job.user_id, AvatarJob.id > job.id, AvatarJob.status == 'done')
+            .limit(1)
+        )
+        user = db.session.get(User, job.user_id)
+        if superseded is not None or user is None or not job.data:
+            _finish(job, 'superseded')
+        else:
+            store_thumbnails(user, normalize_avatar(job.data))
+            _finish(job, 'done')
+        db.session.commit()
+        return True
+    except Exception as e:
+        db.session.rollback()
+        application.logger.warning(f'Ошибка при обработке аватара пользователя {job.user_id}: {e}')
+        _finish(db.session.get(AvatarJob, job_id), 'failed', str(e)[:255])
+        db.session.commit()
+        return False
+
+
+class AvatarJobQueue:
+    def __init__(self, workers=2, enabled=True):
+        self.workers = workers
+        self.enabled = enabled
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if not self.enabled or self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='avatar')
+            self._pid = os.getpid()
+
+        self._executor.submit(self._resume)
+
+    def submit(self, job_id):
+        if not self.enabled:
+            process_avatar_job(job_id)
+            return
+
+        self.start()
+        self._executor.submit(self._run, job_id)
+
+    def _run(self, job_id):
+        with application.app_context():
+            process_avatar_job(job_id)
+
+    def _resume(self):
+        with application.app_context():
+            job_ids = pending_avatar_jobs()
+        for job_id in job_ids:
+            self._executor.submit(self._run, job_id)
+
+
+avatar_jobs = AvatarJobQueue(
+    workers=application.config.get('AVATAR_WORKERS', 2),
+    enabled=application.config.get('AVATAR_ASYNC', True)
+)
@@ -0,0 +1,71 @@
+import click
+import sqlalchemy as sa
+from app import application, db
+from app.models import User
+from app.avatars import store_thumbnails, load_avatar_owner, pending_avatar_jobs, process_avatar_job
+from app import search as search_index
+from app.counters import reconcile_topic_counters
+from app.follows import reconcile_follow_counts
+
+
+@application.cli.group()
+def avatars():
+    pass
+
+
+@avatars.command('rebuild')
+def rebuild_avatars():
+    user_ids = db.session.scalars(sa.select(User.id).where(User.avatar_data.is_not(None))).all()
+    rebuilt = 0
+    for user_id in user_ids:
+        user = load_avatar_owner(user_id)
+        try:
+            store_thumbnails(user, user.avatar_data)
+            db.session.commit()
+            rebuilt += 1
+        except Exception as e:
+            db.session.rollback()
+            click.echo(f'Пользователь {user.username}: {e}')
+        db.session.expunge_all()
+
+    click.echo(f'Миниатюры пересобраны: {rebuilt} из {len(user_ids)}')
+
+
+@avatars.command('process')
+def process_avatars():
+    job_ids = pending_avatar_jobs()
+    processed = sum(1 for job_id in job_ids if process_avatar_job(job_id))
+    click.echo(f'Загрузки аватаров обработаны: {processed} из {len(job_ids)}')
+
+
+@application.cli.group()
+def search():
+    pass
+
+
+@search.command('rebuild')
+def rebuild_search():
+    search_index.rebuild_index()
+    click.echo(f'Поисковый индекс пересобран ({search_index.get_backend().name})')
+
+
+@application.cli.group()
+def forum():
+    pass
+
+
+@forum.command()
+def reconcile():
+    updated = reconcile_topic_counters()
+    click.echo(f'Счётчики тем пересчитаны: {updated}')
+
+
+@application.cli.group()
+def follows():
+    pass
+
+
+@follows.command('reconcile')
+def reconcile_follows():
+    updated = reconcile_follow_counts()
+    click.echo(f'Счётчики подписок пересчитаны: {updated}')
@@ -0,0 +1,65 @@
+from collections import Counter
+import sqlalchemy as sa
+import sqlalchemy.orm as so
+from app import db
+from app.models import ForumTopic, CommentTopic
+
+
+def _latest_comment(topic_id_column):
+    return (
+        sa.select(sa.func.max(CommentTopic.timestamp))
+        .where(CommentTopic.topic_id == topic_id_column)
+        .scalar_subquery()
+    )
+
+
+def recalculate_topics(connection, topic_ids=None):
+    statement = sa.update(ForumTopic.__table__).values(
+        comment_count=(
+            sa.select(sa.func.count(CommentTopic.id))
+            .where(CommentTopic.topic_id == ForumTopic.__table__.c.id)
+            .scalar_subquery()
+        ),
+        last_activity_at=sa.func.coalesce(_latest_comment(ForumTopic.__table__.c.id),
+                                          ForumTopic.__table__.c.timestamp)
+    )
+    if topic_ids is not None:
+        statement = statement.where(ForumTopic.__table__.c.id.in_(topic_ids))
+    return connection.execute(statement).rowcount
+
+
+def reconcile_topic_counters():
+    updated = recalculate_topics(db.session.connection())
+    db.session.commit()
+    return updated
+
+
+@sa.event.listens_for(so.Session, 'after_flush')
+def _update_topic_counters(session, flush_context):
+    table = ForumTopic.__table__
+    added = Counter()
+    latest = {}
+    for obj in session.new:
+        if isinstance(obj, CommentTopic):
+            added[obj.topic_id] += 1
+            latest[obj.topic_id] = max(latest.get(obj.topic_id, obj.timestamp), obj.timestamp)
+
+    removed = {obj.topic_id for obj in session.deleted if isinstance(obj, CommentTopic)}
+    if not added and not removed:
+        return
+
+    connection = session.connection()
+    for topic_id, count in added.items():
+        connection.execute(
+            table.update()
+            .where(table.c.id == topic_id)
+            .values(
+                comment_count=table.c.comment_count + count,
+                last_activity_at=sa.case(
+                    (table.c.last_activity_at < latest[topic_id], latest[topic_id]),
+                    else_=table.c.last_activity_at
+                )
+            )
+        )
+    if removed:
+        recalculate_topics(connection, removed)
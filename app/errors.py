@@ -5,6 +5,14 @@ from app import application, db
 def not_found_error(error):
     return render_template('404.html'), 404
 
+@application.errorhandler(429)
+def too_many_requests_error(error):
+    return render_template('429.html'), 429, {'Retry-After': str(error.retry_after or 60)}
+
+@application.errorhandler(503)
+def service_unavailable_error(error):
+    return render_template('503.html'), 503, {'Retry-After': str(error.retry_after or 1)}
+
 @application.errorhandler(500)
 def internal_error(error):
     db.session.rollback()
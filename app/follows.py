@@ -0,0 +1,95 @@
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from app import db
+from app.models import User, followers
+from app.page_cache import invalidate_pages
+
+
+def _insert_ignore(follower_id, followed_id):
+    values = {'follower_id': follower_id, 'followed_id': followed_id}
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect == 'sqlite':
+        return sqlite.insert(followers).values(values).on_conflict_do_nothing()
+    if dialect == 'postgresql':
+        return postgresql.insert(followers).values(values).on_conflict_do_nothing()
+    if dialect in ('mysql', 'mariadb'):
+        return mysql.insert(followers).values(values).prefix_with('IGNORE')
+
+    exists = sa.exists().where(followers.c.follower_id == follower_id, followers.c.followed_id == followed_id)
+    return sa.insert(followers).from_select(
+        ['follower_id', 'followed_id'],
+        sa.select(sa.literal(follower_id), sa.literal(followed_id)).where(~exists)
+    )
+
+
+def _adjust_counts(user, target, delta):
+    db.session.execute(
+        sa.update(User)
+        .where(User.id.in_((user.id, target.id)))
+        .values(
+            following_count=User.following_count + sa.case((User.id == user.id, delta), else_=0),
+            followers_count=User.followers_count + sa.case((User.id == target.id, delta), else_=0)
+        )
+        .execution_options(synchronize_session=False)
+    )
+    for obj in (user, target):
+        if isinstance(obj, User):
+            db.session.expire(obj, ['following_count', 'followers_count'])
+
+
+def follow(user, target):
+    if user.id == target.id:
+        return False
+
+    inserted = db.session.execute(_insert_ignore(user.id, target.id)).rowcount == 1
+    if inserted:
+        _adjust_counts(user, target, 1)
+        invalidate_pages(db.session, 'content')
+    return inserted
+
+
+def unfollow(user, target):
+    deleted = db.session.execute(
+        sa.delete(followers)
+        .where(followers.c.follower_id == user.id, followers.c.followed_id == target.id)
+    ).rowcount == 1
+    if deleted:
+        _adjust_counts(user, target, -1)
+        invalidate_pages(db.session, 'content')
+    return deleted
+
+
+def is_following_many(user, candidate_ids):
+    candidate_ids = {candidate_id for candidate_id in candidate_ids if candidate_id is not None}
+    if user.id is None or not candidate_ids:
+        return set()
+
+    return set(db.session.scalars(
+        sa.select(followers.c.followed_id)
+        .where(followers.c.follower_id == user.id, followers.c.followed_id.in_(candidate_ids))
+    ))
+
+
+def is_following(user, target):
+    return target.id in is_following_many(user, [target.id])
+
+
+def reconcile_follow_counts():
+    table = User.__table__
+    updated = db.session.execute(
+        sa.update(table).values(
+            followers_count=(
+                sa.select(sa.func.count())
+                .where(followers.c.followed_id == table.c.id)
+                .scalar_subquery()
+            ),
+            following_count=(
+                sa.select(sa.func.count())
+                .where(followers.c.follower_id == table.c.id)
+                .scalar_subquery()
+            )
+        )
+    ).rowcount
+    db.session.commit()
+    return updated
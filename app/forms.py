@@ -2,6 +2,7 @@ from flask_wtf import FlaskForm
 from flask_wtf.file import FileField, FileAllowed, FileRequired
 from wtforms import StringField, PasswordField, BooleanField, SubmitField, TextAreaField
 from wtforms.validators import ValidationError, DataRequired, Email, EqualTo, Length
+from flask import current_app
 import sqlalchemy as sa
 from app import db
 from app.models import User
@@ -17,7 +18,7 @@ class LoginForm(FlaskForm):
 class EditProfileForm(FlaskForm):
     username = StringField('Имя', validators=[DataRequired()])
     about_me = TextAreaField('Обо мне', validators=[Length(min=0, max=140)])
-    avatar = FileField('Выберите аватар', validators=[FileAllowed(['jpg', 'png', 'jpeg'])])
+    avatar = FileField('Выберите аватар', validators=[FileAllowed(['jpg', 'png', 'jpeg', 'webp'])])
     submit = SubmitField('Обновить')
     subscribe = SubmitField('Подписаться')
 
@@ -32,6 +33,18 @@ class EditProfileForm(FlaskForm):
             if user is not None:
                 raise ValidationError('Это имя пользователя уже занято.')
 
+    def validate_avatar(self, avatar):
+        if not avatar.data:
+            return
+
+        limit = current_app.config.get('AVATAR_MAX_UPLOAD_BYTES', 5 * 1024 * 1024)
+        stream = avatar.data.stream
+        stream.seek(0, 2)
+        size = stream.tell()
+        stream.seek(0)
+        if size > limit:
+            raise ValidationError(f'Размер файла не должен превышать {limit // (1024 * 1024)} МБ.')
+
 
 class RegistrationForm(FlaskForm):
     username = StringField('Логин', validators=[DataRequired()])
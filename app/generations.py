@@ -0,0 +1,35 @@
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from app.models import Generation
+
+table = Generation.__table__
+
+
+def _insert_missing(dialect, name):
+    values = {'name': name, 'value': 0}
+
+    if dialect == 'sqlite':
+        return sqlite.insert(table).values(values).on_conflict_do_nothing()
+    if dialect == 'postgresql':
+        return postgresql.insert(table).values(values).on_conflict_do_nothing()
+    if dialect in ('mysql', 'mariadb'):
+        return mysql.insert(table).values(values).prefix_with('IGNORE')
+
+    exists = sa.exists().where(table.c.name == name)
+    return sa.insert(table).from_select(['name', 'value'], sa.select(sa.literal(name), sa.literal(0)).where(~exists))
+
+
+def generation_value(name):
+    return sa.func.coalesce(sa.select(table.c.value).where(table.c.name == name).scalar_subquery(), 0)
+
+
+def read_generation(connection, name):
+    return connection.execute(sa.select(table.c.value).where(table.c.name == name)).scalar() or 0
+
+
+def bump_generation(connection, name):
+    statement = sa.update(table).where(table.c.name == name).values(value=table.c.value + 1)
+    if not connection.execute(statement).rowcount:
+        connection.execute(_insert_missing(connection.dialect.name, name))
+        connection.execute(statement)
+    return read_generation(connection, name)
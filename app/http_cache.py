@@ -0,0 +1,160 @@
+from functools import wraps
+import gzip
+import hashlib
+import os
+import time
+from flask import request, session, make_response, current_app
+from flask_login import current_user
+from app.cache import LRUCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE_MIMETYPES = {'text/html', 'text/css', 'text/plain', 'text/javascript', 'application/javascript',
+                          'application/json', 'image/svg+xml'}
+STATIC_MAX_AGE = 365 * 24 * 3600
+
+static_versions = {}
+compressed_static = LRUCache(maxsize=128)
+
+
+def _identity():
+    if current_user.is_authenticated:
+        return current_user.id, current_user.username, current_user.avatar_etag, current_user.is_admin
+    return 'anonymous'
+
+
+def _csrf_bucket():
+    period = max((current_app.config.get('WTF_CSRF_TIME_LIMIT') or 3600) // 2, 60)
+    return session.get('csrf_token'), int(time.time() // period)
+
+
+def conditional(version):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+                return view(*args, **kwargs)
+
+            state = version(*args, **kwargs)
+            if state is None:
+                return view(*args, **kwargs)
+
+            last_modified, token = state
+            key = repr((request.endpoint, request.full_path, last_modified, token, _identity(), _csrf_bucket()))
+            etag = hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
+
+
+def _choose_encoding():
+    if brotli is not None and request.accept_encodings['br']:
+        return 'br'
+    if request.accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def _compress(data, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(data, quality=min(level, 11))
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _static_version(filename):
+    path = os.path.join(current_app.static_folder, filename)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    cached = static_versions.get(filename)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    with open(path, 'rb') as f:
+        version = hashlib.md5(f.read()).hexdigest()[:12]
+    static_versions[filename] = (mtime, version)
+    return version
+
+
+def init_http_cache(app):
+    min_size = app.config.get('COMPRESS_MIN_SIZE', 500)
+    level = app.config.get('COMPRESS_LEVEL', 6)
+    compress_enabled = app.config.get('COMPRESS_ENABLED', True)
+
+    @app.url_defaults
+    def fingerprint_static(endpoint, values):
+        if endpoint == 'static' and 'v' not in values and 'filename' in values:
+            version = _static_version(values['filename'])
+            if version:
+                values['v'] = version
+
+    @app.after_request
+    def finish_response(response):
+        if request.method not in ('GET', 'HEAD') or response.status_code != 200:
+            return response
+
+        if request.endpoint == 'static':
+            if request.args.get('v'):
+                response.cache_control.no_cache = None
+                response.cache_control.public = True
+                response.cache_control.max_age = STATIC_MAX_AGE
+                response.cache_control.immutable = True
+        elif not response.is_streamed and 'ETag' not in response.headers:
+            response.add_etag(weak=True)
+            if response.mimetype == 'text/html' and not response.cache_control:
+                response.cache_control.private = True
+                response.cache_control.no_cache = True
+            response.make_conditional(request)
+            if response.status_code != 200:
+                return response
+
+        if not compress_enabled or response.mimetype not in COMPRESSIBLE_MIMETYPES \
+                or 'Content-Encoding' in response.headers \
+                or (response.is_streamed and not response.direct_passthrough):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = _choose_encoding()
+        if encoding is None:
+            return response
+
+        static_key = None
+        if response.direct_passthrough:
+            response.direct_passthrough = False
+            static_key = (request.path, response.get_etag()[0], encoding)
+
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+
+        payload = compressed_static.get(static_key) if static_key else None
+        if payload is None:
+            payload = _compress(data, encoding, level)
+            if static_key is not None:
+                compressed_static.set(static_key, payload)
+
+        response.set_data(payload)
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
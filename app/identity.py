@@ -0,0 +1,85 @@
+import sqlalchemy as sa
+import sqlalchemy.orm as so
+from flask_login import UserMixin
+from app import application, db, login
+from app.cache import LRUCache
+from app.models import User
+
+
+IDENTITY_COLUMNS = (User.id, User.username, User.is_admin, User.is_banned, User.avatar_etag)
+
+identity_cache = LRUCache(
+    maxsize=application.config.get('IDENTITY_CACHE_SIZE', 4096),
+    ttl=application.config.get('IDENTITY_CACHE_TTL', 30)
+)
+
+
+class CachedUser(UserMixin):
+    def __init__(self, id, username, is_admin, is_banned, avatar_etag):
+        self.id = id
+        self.username = username
+        self.is_admin = is_admin
+        self.is_banned = is_banned
+        self.avatar_etag = avatar_etag
+
+    defult_avatar = User.defult_avatar
+    avatar = User.avatar
+    feed_author_ids = User.feed_author_ids
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+
+        user = self.__dict__.get('_user')
+        if user is None:
+            user = self.__dict__['_user'] = db.session.get(User, self.id)
+        return getattr(user, name)
+
+    def __str__(self):
+        return self.username
+
+    def __repr__(self):
+        return '<CachedUser {}>'.format(self.username)
+
+
+def invalidate_identity(user_id):
+    identity_cache.delete(user_id)
+
+
+@login.user_loader
+def load_user(id):
+    try:
+        user_id = int(id)
+    except (TypeError, ValueError):
+        return None
+
+    row = identity_cache.get(user_id)
+    if row is None:
+        row = db.session.execute(sa.select(*IDENTITY_COLUMNS).where(User.id == user_id)).first()
+        if row is None:
+            return None
+        row = tuple(row)
+        identity_cache.set(user_id, row)
+
+    identity = CachedUser(*row)
+    if identity.is_banned:
+        return None
+    return identity
+
+
+@sa.event.listens_for(so.Session, 'after_flush')
+def _collect_identities(session, flush_context):
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            session.info.setdefault('identity_invalidate', set()).add(obj.id)
+
+
+@sa.event.listens_for(so.Session, 'after_commit')
+def _invalidate_identities(session):
+    for user_id in session.info.pop('identity_invalidate', ()):
+        invalidate_identity(user_id)
+
+
+@sa.event.listens_for(so.Session, 'after_rollback')
+def _discard_identities(session):
+    session.info.pop('identity_invalidate', None)
@@ -0,0 +1,176 @@
+from collections import defaultdict
+import cProfile
+import logging
+import os
+import random
+import threading
+import time
+import sqlalchemy as sa
+from flask import g, request, has_request_context, abort
+from app import db
+from app.page_cache import page_cache
+
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class EndpointStats:
+    def __init__(self):
+        self.requests = 0
+        self.duration = 0.0
+        self.queries = 0
+        self.sql_duration = 0.0
+        self.response_bytes = 0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+
+    def add(self, duration, queries, sql_duration, response_bytes):
+        self.requests += 1
+        self.duration += duration
+        self.queries += queries
+        self.sql_duration += sql_duration
+        self.response_bytes += response_bytes
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if duration <= bound:
+                self.buckets[i] += 1
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = defaultdict(EndpointStats)
+
+    def record(self, endpoint, duration, queries, sql_duration, response_bytes):
+        with self._lock:
+            self._endpoints[endpoint].add(duration, queries, sql_duration, response_bytes)
+
+    def render(self, extra=None):
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            lines = []
+
+            def metric(name, kind, help_text, values):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                lines.extend(values)
+
+            metric('app_requests_total', 'counter', 'Обработанные запросы.',
+                   [f'app_requests_total{{endpoint="{name}"}} {stats.requests}' for name, stats in endpoints])
+
+            histogram = []
+            for name, stats in endpoints:
+                for bound, count in zip(DURATION_BUCKETS, stats.buckets):
+                    histogram.append(f'app_request_duration_seconds_bucket{{endpoint="{name}",le="{bound}"}} {count}')
+                histogram.append(f'app_request_duration_seconds_bucket{{endpoint="{name}",le="+Inf"}} {stats.requests}')
+                histogram.append(f'app_request_duration_seconds_sum{{endpoint="{name}"}} {stats.duration:.6f}')
+                histogram.append(f'app_request_duration_seconds_count{{endpoint="{name}"}} {stats.requests}')
+            metric('app_request_duration_seconds', 'histogram', 'Время обработки запроса.', histogram)
+
+            metric('app_sql_queries_total', 'counter', 'SQL запросы, выполненные при обработке.',
+                   [f'app_sql_queries_total{{endpoint="{name}"}} {stats.queries}' for name, stats in endpoints])
+            metric('app_sql_duration_seconds_total', 'counter', 'Суммарное время SQL запросов.',
+                   [f'app_sql_duration_seconds_total{{endpoint="{name}"}} {stats.sql_duration:.6f}'
+                    for name, stats in endpoints])
+            metric('app_response_bytes_total', 'counter', 'Размер отданных ответов.',
+                   [f'app_response_bytes_total{{endpoint="{name}"}} {stats.response_bytes}' for name, stats in endpoints])
+
+        for name, kind, help_text, value in extra or ():
+            metric(name, kind, help_text, [f'{name} {value}'])
+
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['query_started'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not has_request_context() or 'instrumentation' not in g:
+        return
+
+    elapsed = time.perf_counter() - conn.info.pop('query_started', time.perf_counter())
+    state = g.instrumentation
+    state['queries'] += 1
+    state['sql_duration'] += elapsed
+    state['statements'].append((elapsed, statement))
+
+
+def init_instrumentation(app):
+    request_logger = logging.getLogger(f'{app.logger.name}.requests')
+    slowest = app.config.get('INSTRUMENTATION_SLOWEST_STATEMENTS', 3)
+    log_requests = app.config.get('INSTRUMENTATION_LOG', True)
+    sample_rate = app.config.get('PROFILE_SAMPLE_RATE', 0.0)
+    profile_threshold = app.config.get('PROFILE_THRESHOLD_MS', 500) / 1000
+    profile_dir = app.config.get('PROFILE_DIR', os.path.join('logs', 'profiles'))
+    metrics_token = app.config.get('METRICS_TOKEN')
+
+    with app.app_context():
+        sa.event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+        sa.event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
+
+    def start_instrumentation():
+        g.instrumentation = {'started': time.perf_counter(), 'queries': 0, 'sql_duration': 0.0,
+                             'statements': [], 'profiler': None}
+        if sample_rate and random.random() < sample_rate:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            g.instrumentation['profiler'] = profiler
+
+    app.before_request_funcs.setdefault(None, []).insert(0, start_instrumentation)
+
+    @app.after_request
+    def finish_instrumentation(response):
+        state = g.pop('instrumentation', None)
+        if state is None:
+            return response
+
+        duration = time.perf_counter() - state['started']
+        endpoint = request.endpoint or 'unknown'
+        response_bytes = 0 if response.is_streamed else (response.content_length or 0)
+        metrics.record(endpoint, duration, state['queries'], state['sql_duration'], response_bytes)
+
+        profiler = state['profiler']
+        profile_path = None
+        if profiler is not None:
+            profiler.disable()
+            if duration >= profile_threshold:
+                os.makedirs(profile_dir, exist_ok=True)
+                profile_path = os.path.join(profile_dir, f'{int(time.time() * 1000)}-{endpoint}.prof')
+                profiler.dump_stats(profile_path)
+
+        if log_requests:
+            statements = sorted(state['statements'], key=lambda item: item[0], reverse=True)[:slowest]
+            request_logger.info('request', extra={'fields': {
+                'endpoint': endpoint,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round(duration * 1000, 3),
+                'queries': state['queries'],
+                'sql_ms': round(state['sql_duration'] * 1000, 3),
+                'response_bytes': response_bytes,
+                'slowest_statements': [
+                    {'ms': round(elapsed * 1000, 3), 'sql': ' '.join(statement.split())[:500]}
+                    for elapsed, statement in statements
+                ],
+                'profile': profile_path,
+            }})
+
+        return response
+
+    def metrics_view():
+        if metrics_token and request.args.get('token') != metrics_token \
+                and request.headers.get('Authorization') != f'Bearer {metrics_token}':
+            abort(403)
+
+        cache = page_cache.stats()
+        body = metrics.render(extra=[
+            ('app_page_cache_hits_total', 'counter', 'Попадания в кэш страниц.', cache['hits']),
+            ('app_page_cache_misses_total', 'counter', 'Промахи кэша страниц.', cache['misses']),
+            ('app_page_cache_entries', 'gauge', 'Записей в кэше страниц.', cache['size']),
+        ])
+        return body, 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
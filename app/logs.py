@@ -0,0 +1,158 @@
+from datetime import datetime, timezone
+import atexit
+import copy
+import json
+import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler, \
+    WatchedFileHandler
+import os
+import queue
+import random
+import time
+import uuid
+from flask import g, request, has_request_context
+
+RECORD_FIELDS = ('request_id', 'endpoint', 'elapsed_ms')
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'location': f'{record.pathname}:{record.lineno}',
+        }
+        for name in RECORD_FIELDS:
+            value = getattr(record, name, None)
+            if value is not None:
+                payload[name] = value
+        payload.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            payload['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload['exception'] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        line = super().format(record)
+        extra = {name: getattr(record, name) for name in RECORD_FIELDS if getattr(record, name, None) is not None}
+        extra.update(getattr(record, 'fields', None) or {})
+        if extra:
+            line += ' ' + json.dumps(extra, ensure_ascii=False, default=str)
+        return line
+
+
+class RequestContextFilter(logging.Filter):
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.endpoint = request.endpoint
+            started = g.get('request_started')
+            if started is not None:
+                record.elapsed_ms = round((time.perf_counter() - started) * 1000, 3)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def _rate(self, name):
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition('.')[0]
+        return 1.0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class DroppingQueueHandler(QueueHandler):
+    dropped = 0
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _file_handler(config, rotation):
+    directory = config.get('LOG_DIR', 'logs')
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, config.get('LOG_FILE', 'microblog.log'))
+    backup_count = config.get('LOG_BACKUP_COUNT', 10)
+
+    if rotation == 'external':
+        handler = WatchedFileHandler(path, encoding='utf-8', delay=True)
+    elif rotation == 'time':
+        handler = TimedRotatingFileHandler(path, when=config.get('LOG_ROTATION_WHEN', 'midnight'),
+                                           backupCount=backup_count, encoding='utf-8', delay=True)
+    else:
+        handler = RotatingFileHandler(path, maxBytes=config.get('LOG_MAX_BYTES', 10 * 1024 * 1024),
+                                      backupCount=backup_count, encoding='utf-8', delay=True)
+
+    if config.get('LOG_FORMAT', 'json') == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(TextFormatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'))
+    return handler
+
+
+def configure_logging(app):
+    config = app.config
+    level = config.get('LOG_LEVEL', logging.INFO)
+    rotation = config.get('LOG_ROTATION', os.environ.get('LOG_ROTATION', 'size'))
+    handler = _file_handler(config, rotation)
+    handler.setLevel(level)
+
+    queue_handler = DroppingQueueHandler(queue.Queue(maxsize=config.get('LOG_QUEUE_SIZE', 10000)))
+    queue_handler.addFilter(RequestContextFilter())
+    queue_handler.addFilter(SamplingFilter(config.get('LOG_SAMPLING', {})))
+    app.logger.addHandler(queue_handler)
+    app.logger.setLevel(level)
+
+    state = {'listener': QueueListener(queue_handler.queue, handler, respect_handler_level=True)}
+    state['listener'].start()
+    atexit.register(lambda: state['listener'].stop())
+
+    def restart_listener():
+        worker_handler = _file_handler(config, 'external')
+        worker_handler.setLevel(level)
+        queue_handler.queue = queue.Queue(maxsize=config.get('LOG_QUEUE_SIZE', 10000))
+        state['listener'] = QueueListener(queue_handler.queue, worker_handler, respect_handler_level=True)
+        state['listener'].start()
+
+    os.register_at_fork(after_in_child=restart_listener)
+
+    @app.before_request
+    def assign_request_id():
+        g.request_started = time.perf_counter()
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+
+    @app.after_request
+    def expose_request_id(response):
+        if 'request_id' in g:
+            response.headers['X-Request-ID'] = g.request_id
+        return response
+
+    return queue_handler
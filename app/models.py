@@ -4,11 +4,14 @@ import sqlalchemy as sa
 import sqlalchemy.orm as so
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
-from app import db, login
-from flask import url_for
-from PIL import Image
-import base64
-import io
+from app import db
+from flask import url_for, current_app
+
+
+DEFAULT_AVATAR_FILES = {
+    32: 'avatars/default_icon_avatar32.jpg',
+    128: 'avatars/default.jpg'
+}
 
 
 followers = sa.Table(
@@ -24,17 +27,20 @@ class User(UserMixin, db.Model):
     username: so.Mapped[str] = so.mapped_column(sa.String(64), index=True, unique=True)
     email: so.Mapped[str] = so.mapped_column(sa.String(120), index=True, unique=True)
     password_hash: so.Mapped[Optional[str]] = so.mapped_column(sa.String(256))
-    avatar_data: so.Mapped[Optional[bytes]] = so.mapped_column(sa.LargeBinary)
+    avatar_data: so.Mapped[Optional[bytes]] = so.mapped_column(sa.LargeBinary, deferred=True)
+    avatar_etag: so.Mapped[Optional[str]] = so.mapped_column(sa.String(40))
     about_me: so.Mapped[Optional[str]] = so.mapped_column(sa.String(140))
     last_seen: so.Mapped[Optional[datetime]] = so.mapped_column(default=lambda: datetime.now(timezone.utc))
     is_admin: so.Mapped[bool] = so.mapped_column(sa.Boolean, default=False)
     is_banned: so.Mapped[bool] = so.mapped_column(sa.Boolean, default=False)
+    followers_count: so.Mapped[int] = so.mapped_column(default=0, server_default='0')
+    following_count: so.Mapped[int] = so.mapped_column(default=0, server_default='0')
 
     followed: so.WriteOnlyMapped['User'] = so.relationship(
         secondary=followers, 
         primaryjoin=(followers.c.follower_id == id), 
         secondaryjoin=(followers.c.followed_id == id), 
-        backref=so.backref('followers', lazy='dynamic') 
+        backref=so.backref('followers', lazy='write_only') 
     )
 
     reviews: so.WriteOnlyMapped['ReviewsMessage'] = so.relationship(back_populates='author', cascade='all, delete-orphan', passive_deletes=True)
@@ -48,75 +54,57 @@ class User(UserMixin, db.Model):
         return '<User {}>'.format(self.username)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = generate_password_hash(password, current_app.config.get('PASSWORD_HASH_METHOD', 'scrypt'))
 
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
     
     def defult_avatar(self, size):
-        image = Image.open('app/static/avatars/default.jpg')
-        image.thumbnail((size, size))
+        if current_app.config.get('AVATAR_DEFAULT_STATIC') and size in DEFAULT_AVATAR_FILES:
+            return url_for('static', filename=DEFAULT_AVATAR_FILES[size])
 
-        output_stream = io.BytesIO()
-        image.save(output_stream, format=image.format)
-        base64_image = base64.b64encode(output_stream.getvalue()).decode('utf-8')
-        return f'data:image/jpeg;base64,{base64_image}'
+        return url_for('default_avatar', size=size)
     
-    def follow(self, user):
-        if not self.is_following(user):
-            self.followed.add(user)
-
-    def unfollow(self, user):
-        if self.is_following(user):
-            self.followed.remove(user)
-
-    def is_following(self, user):
-        if user.id is None: 
-            return False
-
-        return db.session.scalar(self.followed.select().where(User.id == user.id).limit(1)) is not None
-
-    def followed_topics_query(self):
-        followed_user_ids_query = sa.select(followers.c.followed_id).where(followers.c.follower_id == self.id)
-        followed_user_ids = db.session.scalars(followed_user_ids_query).all()
-        followed_user_ids.append(self.id)
-
-        return sa.select(ForumTopic).where(ForumTopic.user_id.in_(followed_user_ids))
+    def feed_author_ids(self):
+        followed_user_ids = db.session.scalars(
+            sa.select(followers.c.followed_id).where(followers.c.follower_id == self.id)
+        )
+        return [self.id, *followed_user_ids]
 
     
     def avatar(self, size):
-        if self.avatar_data:
-            try:
-                image = Image.open(io.BytesIO(self.avatar_data))
-                image.thumbnail((size, size))
+        if self.avatar_etag is None:
+            return self.defult_avatar(size)
 
-                if image.format == 'JPEG' and image.mode == 'RGBA':
-                    image = image.convert('RGB')
+        return url_for('avatar', user_id=self.id, size=size, v=self.avatar_etag)
 
-                output_stream = io.BytesIO()
-                image.save(output_stream, format=image.format)
 
-                base64_image = base64.b64encode(output_stream.getvalue()).decode('utf-8')
-                return f'data:image/jpeg;base64,{base64_image}'
-            
-            except Exception as e:
-                print(f"Ошибка при обработке аватара: {e}")
-                return self.defult_avatar(size)
+class AvatarThumbnail(db.Model):
+    user_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey(User.id, ondelete='CASCADE'), primary_key=True)
+    size: so.Mapped[int] = so.mapped_column(primary_key=True)
+    etag: so.Mapped[str] = so.mapped_column(sa.String(64))
+    mimetype: so.Mapped[str] = so.mapped_column(sa.String(32))
+    data: so.Mapped[bytes] = so.mapped_column(sa.LargeBinary)
+
+    def __repr__(self):
+        return f'<AvatarThumbnail {self.user_id}x{self.size}>'
 
-        else:
-            return self.defult_avatar(size)
 
+class AvatarJob(db.Model):
+    id: so.Mapped[int] = so.mapped_column(primary_key=True)
+    user_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey(User.id, ondelete='CASCADE'), index=True)
+    status: so.Mapped[str] = so.mapped_column(sa.String(16), index=True, default='pending')
+    data: so.Mapped[Optional[bytes]] = so.mapped_column(sa.LargeBinary, deferred=True)
+    attempts: so.Mapped[int] = so.mapped_column(default=0, server_default='0')
+    error: so.Mapped[Optional[str]] = so.mapped_column(sa.String(255))
+    created_at: so.Mapped[datetime] = so.mapped_column(default=lambda: datetime.now(timezone.utc))
+    claimed_at: so.Mapped[Optional[datetime]]
+    finished_at: so.Mapped[Optional[datetime]]
 
-@login.user_loader
-def load_user(id):
-    if id is not None:
-        user = db.session.get(User, int(id)) 
-        if user and not user.is_banned:
-            return user
+    def __repr__(self):
+        return f'<AvatarJob {self.id} {self.status}>'
 
-    return None
 
-    
 class ReviewsMessage(db.Model):
     id: so.Mapped[int] = so.mapped_column(primary_key=True)
     body: so.Mapped[str] = so.mapped_column(sa.String(140))
@@ -135,11 +123,18 @@ class ForumTopic(db.Model):
     title: so.Mapped[str] = so.mapped_column(sa.String(128), index=True) 
     body: so.Mapped[str] = so.mapped_column(sa.String(8000)) 
     timestamp: so.Mapped[datetime] = so.mapped_column(index=True, default=lambda: datetime.now(timezone.utc))
-    user_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey(User.id, ondelete='CASCADE'), index=True)
+    user_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey(User.id, ondelete='CASCADE'))
+    comment_count: so.Mapped[int] = so.mapped_column(default=0, server_default='0')
+    last_activity_at: so.Mapped[datetime] = so.mapped_column(index=True, default=lambda context: context.get_current_parameters()['timestamp'])
 
     author: so.Mapped[User] = so.relationship(back_populates='topics')
     comments: so.WriteOnlyMapped['CommentTopic'] = so.relationship(back_populates='topic', cascade='all, delete-orphan', passive_deletes=True)
 
+    __table_args__ = (
+        sa.Index('ix_forum_topic_user_id_timestamp', 'user_id', 'timestamp'),
+        sa.Index('ix_forum_topic_user_id_last_activity_at', 'user_id', 'last_activity_at'),
+    )
+
     def __repr__(self):
         return f'<Topic {self.title}>'
 
@@ -149,12 +144,20 @@ class CommentTopic(db.Model):
     body: so.Mapped[str] = so.mapped_column(sa.String(3000))
     timestamp: so.Mapped[datetime] = so.mapped_column(index=True, default=lambda: datetime.now(timezone.utc))
     user_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey(User.id, ondelete='CASCADE'), index=True)
-    topic_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey(ForumTopic.id, ondelete='CASCADE'), index=True)
+    topic_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey(ForumTopic.id, ondelete='CASCADE'))
 
     author: so.Mapped[User] = so.relationship(back_populates='comments')
     topic: so.Mapped[ForumTopic] = so.relationship(back_populates='comments')
 
+    __table_args__ = (
+        sa.Index('ix_comment_topic_topic_id_timestamp_id', 'topic_id', 'timestamp', 'id'),
+    )
+
 class MyProjects(db.Model):
     id: so.Mapped[int] = so.mapped_column(primary_key=True)
     name: so.Mapped[str] = so.mapped_column(sa.String(64), index=True, unique=True)
-    body: so.Mapped[str] = so.mapped_column(sa.String(3000))
\ No newline at end of file
+    body: so.Mapped[str] = so.mapped_column(sa.String(3000))
+
+class Generation(db.Model):
+    name: so.Mapped[str] = so.mapped_column(sa.String(64), primary_key=True)
+    value: so.Mapped[int] = so.mapped_column(default=0, server_default='0')
@@ -0,0 +1,49 @@
+import sqlalchemy as sa
+from app import db
+from app import search
+from app.counters import recalculate_topics
+from app.identity import invalidate_identity
+from app.models import User, ForumTopic, CommentTopic
+from app.page_cache import invalidate_pages
+
+
+def set_banned(user_ids, banned=True):
+    count = db.session.execute(
+        sa.update(User).where(User.id.in_(user_ids)).values(is_banned=banned)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+
+    for user_id in user_ids:
+        invalidate_identity(user_id)
+    return count
+
+
+def delete_topics(topic_ids):
+    db.session.execute(
+        sa.delete(CommentTopic).where(CommentTopic.topic_id.in_(topic_ids))
+        .execution_options(synchronize_session=False)
+    )
+    count = db.session.execute(
+        sa.delete(ForumTopic).where(ForumTopic.id.in_(topic_ids))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    search.remove_documents(db.session, 'topic', topic_ids)
+    invalidate_pages(db.session, 'content')
+    db.session.commit()
+    return count
+
+
+def delete_comments(comment_ids):
+    topic_ids = db.session.scalars(
+        sa.select(CommentTopic.topic_id).where(CommentTopic.id.in_(comment_ids)).distinct()
+    ).all()
+    count = db.session.execute(
+        sa.delete(CommentTopic).where(CommentTopic.id.in_(comment_ids))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    recalculate_topics(db.session.connection(), topic_ids)
+    search.remove_documents(db.session, 'comment', comment_ids)
+    invalidate_pages(db.session, 'content')
+    db.session.commit()
+    return count
@@ -0,0 +1,145 @@
+from functools import wraps
+import threading
+import sqlalchemy as sa
+import sqlalchemy.orm as so
+from flask import request, session, make_response
+from flask_login import current_user
+from werkzeug.utils import import_string
+from app import application, db
+from app.cache import LRUCache
+from app.models import User, ForumTopic, CommentTopic, ReviewsMessage, MyProjects
+from app.generations import bump_generation, read_generation, generation_value
+
+
+class LocalBackend:
+    def __init__(self, maxsize=256, ttl=300):
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value, ttl=None):
+        self._cache.set(key, value, ttl=ttl)
+
+    def clear(self):
+        self._cache.clear()
+
+    def __len__(self):
+        return len(self._cache)
+
+
+class PageCache:
+    def __init__(self, backend, ttl=300, enabled=True):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def generation(self, namespace):
+        if namespace not in INVALIDATED_BY.values():
+            return 0
+        return read_generation(db.session, f'page:{namespace}')
+
+    def generation_value(self, namespace):
+        return generation_value(f'page:{namespace}')
+
+    def invalidate(self, connection, namespace):
+        bump_generation(connection, f'page:{namespace}')
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self.backend)}
+
+    def _key(self, namespace):
+        if current_user.is_authenticated:
+            identity = (current_user.id, current_user.username, current_user.avatar_etag, current_user.is_admin)
+        else:
+            identity = 'anonymous'
+
+        locale = request.accept_languages.best_match(['ru', 'en']) or 'ru'
+        return ('page', namespace, self.generation(namespace), request.full_path, locale, identity)
+
+    def cached(self, namespace):
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or request.method != 'GET' or session.get('_flashes'):
+                    return view(*args, **kwargs)
+
+                key = self._key(namespace)
+                entry = self.backend.get(key)
+                self._count(entry is not None)
+                if entry is not None:
+                    body, mimetype = entry
+                    response = make_response(body)
+                    response.mimetype = mimetype
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    self.backend.set(key, (response.get_data(), response.mimetype), ttl=self.ttl)
+                response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+
+def _create_backend():
+    backend = application.config.get('PAGE_CACHE_BACKEND')
+    if backend:
+        return import_string(backend)() if isinstance(backend, str) else backend
+
+    return LocalBackend(
+        maxsize=application.config.get('PAGE_CACHE_SIZE', 256),
+        ttl=application.config.get('PAGE_CACHE_TTL', 300)
+    )
+
+
+page_cache = PageCache(
+    _create_backend(),
+    ttl=application.config.get('PAGE_CACHE_TTL', 300),
+    enabled=application.config.get('PAGE_CACHE_ENABLED', True)
+)
+
+INVALIDATED_BY = {
+    MyProjects: 'projects',
+    User: 'content',
+    ForumTopic: 'content',
+    CommentTopic: 'content',
+    ReviewsMessage: 'content'
+}
+
+
+def invalidate_pages(session, namespace):
+    invalidated = session.info.setdefault('page_cache_invalidate', set())
+    if namespace not in invalidated:
+        page_cache.invalidate(session.connection(), namespace)
+        invalidated.add(namespace)
+
+
+@sa.event.listens_for(so.Session, 'after_flush')
+def _invalidate(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        namespace = INVALIDATED_BY.get(type(obj))
+        if namespace:
+            invalidate_pages(session, namespace)
+
+
+@sa.event.listens_for(so.Session, 'after_commit')
+def _finish_invalidations(session):
+    session.info.pop('page_cache_invalidate', None)
+
+
+@sa.event.listens_for(so.Session, 'after_rollback')
+def _discard_invalidations(session):
+    session.info.pop('page_cache_invalidate', None)
@@ -0,0 +1,115 @@
+import base64
+import binascii
+from datetime import datetime
+import sqlalchemy as sa
+from app import db
+
+MAX_PARTITIONS = 100
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def encode_cursor(timestamp, id):
+    raw = f'{timestamp.isoformat()}|{id}'.encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        timestamp, id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(timestamp), int(id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def _beyond(timestamp_column, id_column, cursor, older):
+    timestamp, id = cursor
+    if older:
+        return sa.or_(timestamp_column < timestamp,
+                      sa.and_(timestamp_column == timestamp, id_column < id))
+
+    return sa.or_(timestamp_column > timestamp,
+                  sa.and_(timestamp_column == timestamp, id_column > id))
+
+
+def _partitioned(query, timestamp_column, id_column, partition_by, condition, order, limit):
+    column, values = partition_by
+    values = list(dict.fromkeys(values))
+    if not values:
+        return query.where(sa.false())
+    if len(values) == 1 or len(values) > MAX_PARTITIONS:
+        return query.where(column.in_(values))
+
+    arms = []
+    for value in values:
+        arm = sa.select(id_column.label('id')).where(column == value)
+        if condition is not None:
+            arm = arm.where(condition)
+        arms.append(sa.select(arm.order_by(*order).limit(limit).subquery()))
+    keys = sa.union_all(*arms).subquery()
+    return query.where(id_column.in_(sa.select(keys.c.id)))
+
+
+def paginate_keyset(query, timestamp_column, id_column, per_page, after=None, before=None, descending=True,
+                    last=False, partition_by=None):
+    after = decode_cursor(after)
+    before = decode_cursor(before) if after is None else None
+    last = last and after is None and before is None
+
+    def key(item):
+        return encode_cursor(getattr(item, timestamp_column.key), getattr(item, id_column.key))
+
+    condition = None
+    if before is not None or last:
+        order = (timestamp_column.asc(), id_column.asc()) if descending else (timestamp_column.desc(), id_column.desc())
+        if before is not None:
+            condition = _beyond(timestamp_column, id_column, before, older=not descending)
+    else:
+        order = (timestamp_column.desc(), id_column.desc()) if descending else (timestamp_column.asc(), id_column.asc())
+        if after is not None:
+            condition = _beyond(timestamp_column, id_column, after, older=descending)
+
+    if condition is not None:
+        query = query.where(condition)
+    if partition_by is not None:
+        query = _partitioned(query, timestamp_column, id_column, partition_by, condition, order, per_page + 1)
+
+    rows = db.session.scalars(query.order_by(None).order_by(*order).limit(per_page + 1)).all()
+    has_more = len(rows) > per_page
+    items = rows[:per_page]
+
+    if before is not None or last:
+        items.reverse()
+        return KeysetPage(items,
+                          next_cursor=key(items[-1]) if items and before is not None else None,
+                          prev_cursor=key(items[0]) if has_more else None)
+
+    return KeysetPage(items,
+                      next_cursor=key(items[-1]) if has_more else None,
+                      prev_cursor=key(items[0]) if after is not None and items else None)
@@ -0,0 +1,67 @@
+from datetime import datetime, timezone
+import atexit
+import threading
+import time
+import sqlalchemy as sa
+from app import application, db
+from app.models import User
+
+
+class PresenceTracker:
+    def __init__(self, flush_interval=60, flush_threshold=100):
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def touch(self, user_id, seen_at=None):
+        seen_at = seen_at or datetime.now(timezone.utc)
+        with self._lock:
+            self._pending[user_id] = seen_at
+            due = (len(self._pending) >= self.flush_threshold
+                   or time.monotonic() - self._last_flush >= self.flush_interval)
+
+        if due:
+            self.flush()
+
+    def last_seen(self, user_id):
+        with self._lock:
+            return self._pending.get(user_id)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+
+        if not pending:
+            return
+
+        table = User.__table__
+        statement = (
+            table.update()
+            .where(table.c.id == sa.bindparam('user_id'))
+            .values(last_seen=sa.bindparam('seen_at'))
+        )
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(statement, [
+                    {'user_id': user_id, 'seen_at': seen_at} for user_id, seen_at in pending.items()
+                ])
+        except Exception as e:
+            application.logger.warning(f'Не удалось сохранить last_seen: {e}')
+            with self._lock:
+                for user_id, seen_at in pending.items():
+                    self._pending.setdefault(user_id, seen_at)
+
+
+presence = PresenceTracker(
+    flush_interval=application.config.get('PRESENCE_FLUSH_INTERVAL', 60),
+    flush_threshold=application.config.get('PRESENCE_FLUSH_THRESHOLD', 100)
+)
+
+
+@atexit.register
+def _flush_on_exit():
+    with application.app_context():
+        presence.flush()
@@ -1,17 +1,52 @@
 from urllib.parse import urlsplit
-from flask import render_template, flash, redirect, url_for, request
+from flask import render_template, stream_template, flash, redirect, url_for, request, abort, make_response
 from flask_login import login_user, logout_user, current_user, login_required
 import sqlalchemy as sa
-from app import application, db
+import sqlalchemy.orm as so
+from app import application, db, format_datetime
 from app.forms import LoginForm, RegistrationForm, EditProfileForm, FollowToggleForm, ReviewForm, CreateTopicForm, CommentForm
-from app.models import User, ReviewsMessage, ForumTopic, CommentTopic, MyProjects
+from app.models import User, ReviewsMessage, ForumTopic, CommentTopic, MyProjects, followers
+from app.pagination import KeysetPage, paginate_keyset
+from app import search
+from app.presence import presence
+from app import follows
+from app import auth
+from app.page_cache import page_cache
+from app.http_cache import conditional
+from app.avatars import AVATAR_SIZES, get_thumbnail, default_thumbnail, enqueue_avatar, has_pending_avatar, avatar_jobs
 from werkzeug.utils import secure_filename
 from datetime import datetime, timezone, timedelta
-import io
+
+
+def author_summary(relationship):
+    return so.joinedload(relationship).load_only(User.id, User.username)
+
+
+def followed_users(user):
+    return db.session.scalars(
+        sa.select(User)
+        .join(followers, followers.c.followed_id == User.id)
+        .where(followers.c.follower_id == user.id)
+        .options(so.load_only(User.id, User.username, User.avatar_etag))
+    ).all()
+
+
+def content_version():
+    return None, page_cache.generation('content')
+
+
+def topic_version(topic_id):
+    row = db.session.execute(
+        sa.select(ForumTopic.last_activity_at, page_cache.generation_value('content')).where(ForumTopic.id == topic_id)
+    ).first()
+    if row is None:
+        return None
+    return tuple(row)
 
 
 @application.route('/')
 @application.route('/index')
+@page_cache.cached('static')
 def index():
     return render_template('index.html', title='Главная страница')
 
@@ -23,17 +58,24 @@ def login():
         
     form = LoginForm()
 
+    if request.method == 'POST':
+        auth.throttle_login(request.remote_addr, request.form.get('username'))
+
     if form.validate_on_submit():
         user = db.session.scalar(
             sa.select(User).where(User.username == form.username.data))
         
+        if user is None or not auth.verify_password(user.password_hash, form.password.data):
+            flash('Invalid username or password')
+            return redirect(url_for('login'))
+
         if user.is_banned:
             flash('Ваш аккаунт заблокирован.', 'error') 
             return redirect(url_for('login'))
-        
-        if user is None or not user.check_password(form.password.data):
-            flash('Invalid username or password')
-            return redirect(url_for('login'))
+
+        if auth.needs_rehash(user.password_hash):
+            user.password_hash = auth.hash_password(form.password.data)
+            db.session.commit()
         
         login_user(user, remember=form.remember_me.data)
         next_page = request.args.get('next')
@@ -65,7 +107,7 @@ def register():
         else:
             user = User(username=form.username.data, email=form.email.data)
             
-        user.set_password(form.password.data)
+        user.password_hash = auth.hash_password(form.password.data)
         db.session.add(user)
         db.session.commit()
         flash('Congratulations, you are now a registered user!')
@@ -75,20 +117,22 @@ def register():
 
 
 @application.route('/about', methods=['GET', 'POST'])
+@page_cache.cached('static')
 def about():
     return render_template('about.html', title='Регистрация')
 
 
 @application.route('/projects', methods=['GET', 'POST'])
+@page_cache.cached('projects')
 def projects():
     myprojects = db.session.scalars(sa.select(MyProjects)).all()
     return render_template('projects.html', title='Регистрация', myprojects=myprojects)
 
 
 @application.route('/reviews', methods=['GET', 'POST'])
+@conditional(content_version)
 def reviews():
     form = ReviewForm()
-    reviews = db.session.scalars(sa.select(ReviewsMessage)).all()
     if form.validate_on_submit():
         try:
             if form.username.data:
@@ -114,19 +158,31 @@ def reviews():
         else:
             form.username.data = current_user.username
 
+    reviews = paginate_keyset(
+        sa.select(ReviewsMessage).options(author_summary(ReviewsMessage.author)),
+        ReviewsMessage.timestamp, ReviewsMessage.id,
+        per_page=application.config.get('REVIEWS_PER_PAGE', 20),
+        after=request.args.get('after'),
+        before=request.args.get('before')
+    )
+
+    if application.config.get('REVIEWS_STREAM'):
+        return stream_template('reviews.html', title='Регистрация', form=form, reviews=reviews)
+
     return render_template('reviews.html', title='Регистрация', form=form, reviews=reviews)
 
 
 @application.route('/price', methods=['GET', 'POST'])
+@page_cache.cached('static')
 def price():
     return render_template('price.html', title='Регистрация')
 
 
 @application.before_request
 def before_request():
-    if current_user.is_authenticated:
-        current_user.last_seen = datetime.now(timezone.utc)
-        db.session.commit()
+    avatar_jobs.start()
+    if request.endpoint != 'static' and current_user.is_authenticated:
+        presence.touch(current_user.id)
 
 
 @application.route('/profile/<username>', methods=['GET', 'POST'])
@@ -140,36 +196,47 @@ def profile(username):
     edit_form = None
     follow_form = None 
     is_following = False 
+    avatar_pending = False
 
     if is_own_profile:
         edit_form = EditProfileForm(current_user.username)
         if edit_form.validate_on_submit():
             try:
+                avatar_job = None
                 if edit_form.avatar.data:
-                     current_user.avatar_data = io.BytesIO(edit_form.avatar.data.read()).read()
+                    avatar_job = enqueue_avatar(user, edit_form.avatar.data.read())
 
-                current_user.about_me = edit_form.about_me.data
-                current_user.username = edit_form.username.data
+                user.about_me = edit_form.about_me.data
+                user.username = edit_form.username.data
 
                 db.session.commit()
-                flash('Изменения приняты успешно!', 'message')
+                if avatar_job is not None:
+                    avatar_jobs.submit(avatar_job.id)
+                    flash('Изменения приняты успешно! Новый аватар появится после обработки.', 'message')
+                else:
+                    flash('Изменения приняты успешно!', 'message')
             except Exception as e:
                 db.session.rollback()
                 flash(f'При изменении данных произошла ошибка: {e}', 'error')
-            return redirect(url_for('profile', username=current_user.username))
+            return redirect(url_for('profile', username=user.username))
 
         elif request.method == 'GET':
-            edit_form.username.data = current_user.username
-            edit_form.about_me.data = current_user.about_me
+            edit_form.username.data = user.username
+            edit_form.about_me.data = user.about_me
+
+        avatar_pending = has_pending_avatar(user.id)
 
     elif show_follow_button: 
         follow_form = FollowToggleForm()
-        is_following = current_user.is_following(user)
+        is_following = user.id in follows.is_following_many(current_user, [user.id])
 
     online_threshold_seconds = 120 
     is_online = False 
-    if user.last_seen:
-         time_difference = datetime.utcnow() - user.last_seen
+    last_seen = presence.last_seen(user.id) or user.last_seen
+    if last_seen:
+         if last_seen.tzinfo is None:
+             last_seen = last_seen.replace(tzinfo=timezone.utc)
+         time_difference = datetime.now(timezone.utc) - last_seen
          is_online = time_difference < timedelta(seconds=online_threshold_seconds)
 
     return render_template(
@@ -179,63 +246,120 @@ def profile(username):
         is_online=is_online,
         edit_form=edit_form, 
         follow_form=follow_form, 
-        is_following=is_following 
+        is_following=is_following,
+        avatar_pending=avatar_pending
     )
 
 
+@application.route('/avatar/<int:user_id>/<int:size>')
+def avatar(user_id, size):
+    if size not in AVATAR_SIZES:
+        abort(404)
+
+    version = request.args.get('v')
+    return _avatar_response(get_thumbnail(user_id, size, version), immutable=bool(version))
+
+
+@application.route('/avatar/default/<int:size>')
+def default_avatar(size):
+    if size not in AVATAR_SIZES:
+        abort(404)
+
+    return _avatar_response(default_thumbnail(size), immutable=False)
+
+
+def _avatar_response(thumbnail, immutable):
+    response = make_response(thumbnail.data)
+    response.mimetype = thumbnail.mimetype
+    response.set_etag(thumbnail.etag)
+    response.cache_control.public = True
+    if immutable:
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.max_age = 86400
+
+    return response.make_conditional(request)
+
+
 @application.route('/forum', methods=['GET', 'POST'])
 @login_required 
+@conditional(content_version)
 def forum():
     filter_by = request.args.get('filter')
     active_filter = 'all'
 
+    partition_by = None
     if filter_by == 'subscribed' and current_user.is_authenticated:
-        topics_query = current_user.followed_topics_query()
+        partition_by = (ForumTopic.user_id, current_user.feed_author_ids())
         active_filter = 'subscribed'
-    else:
-        topics_query = sa.select(ForumTopic)
 
-    topics = db.session.scalars(topics_query.order_by(ForumTopic.timestamp.desc())).all()
+    topics_query = sa.select(ForumTopic).options(author_summary(ForumTopic.author))
+
+    active_sort = 'activity' if request.args.get('sort') == 'activity' else 'new'
+    sort_column = ForumTopic.last_activity_at if active_sort == 'activity' else ForumTopic.timestamp
+
+    topics = paginate_keyset(
+        topics_query, sort_column, ForumTopic.id,
+        per_page=application.config.get('FORUM_TOPICS_PER_PAGE', 20),
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        partition_by=partition_by
+    )
 
     subscribed_users = []
     if current_user.is_authenticated:
-        subscribed_users = db.session.scalars(current_user.followed.select()).all()
+        subscribed_users = followed_users(current_user)
 
     return render_template(
         'forum.html',
         title='Форум',
         topics=topics,
         active_filter=active_filter, 
+        active_sort=active_sort,
         subscribed_users=subscribed_users
     )
 
 @application.route('/search_topics', methods=['GET'])
 @login_required 
+@conditional(content_version)
 def search_topics():
     query = request.args.get('q')
 
     if not query:
         return redirect(url_for('forum'))
 
-    search_results = db.session.scalars(
-        sa.select(ForumTopic)
-        .where(
-            sa.or_(
-                ForumTopic.title.ilike(f'%{query}%'), 
-                ForumTopic.body.ilike(f'%{query}%')   
-            )
+    per_page = application.config.get('FORUM_TOPICS_PER_PAGE', 20)
+    offset = request.args.get('after', type=int)
+    if offset is None:
+        offset = max(request.args.get('before', 0, type=int) - per_page, 0)
+    offset = max(offset, 0)
+
+    topic_ids, has_more = search.search_topic_ids(query, offset, per_page)
+    topics = {
+        topic.id: topic for topic in db.session.scalars(
+            sa.select(ForumTopic)
+            .options(author_summary(ForumTopic.author))
+            .where(ForumTopic.id.in_(topic_ids))
         )
-        .order_by(ForumTopic.timestamp.desc()) 
-    ).all()
+    }
+    found = [topics[topic_id] for topic_id in topic_ids if topic_id in topics]
+
+    search_results = KeysetPage(
+        found,
+        next_cursor=str(offset + per_page) if has_more else None,
+        prev_cursor=str(offset) if offset > 0 else None
+    )
 
     subscribed_users = []
     if current_user.is_authenticated:
-        subscribed_users = db.session.scalars(current_user.followed.select()).all()
+        subscribed_users = followed_users(current_user)
 
     return render_template(
         'forum.html', 
         title=f'Результаты поиска: "{query}"', 
         topics=search_results, 
+        snippets=search.snippets(query, found),
         search_query=query,
         subscribed_users=subscribed_users 
     )
@@ -250,7 +374,7 @@ def create_topic():
             topic = ForumTopic(
                 title=form.title.data,
                 body=form.body.data,
-                author=current_user 
+                user_id=current_user.id
             )
             db.session.add(topic)
             db.session.commit()
@@ -265,8 +389,13 @@ def create_topic():
 
 @application.route('/view_topic/<int:topic_id>', methods=['GET', 'POST'])
 @login_required
+@conditional(topic_version)
 def view_topic(topic_id):
-    topic = db.first_or_404(sa.select(ForumTopic).where(ForumTopic.id == topic_id))
+    topic = db.first_or_404(
+        sa.select(ForumTopic)
+        .options(author_summary(ForumTopic.author))
+        .where(ForumTopic.id == topic_id)
+    )
 
     form = CommentForm()
 
@@ -275,14 +404,14 @@ def view_topic(topic_id):
             try:
                 comment = CommentTopic(
                     body=form.body.data,
-                    author=current_user, 
+                    user_id=current_user.id,
                     topic=topic
                 )
                 db.session.add(comment) 
                 db.session.commit()
 
                 flash('Ваш комментарий добавлен!', 'message') 
-                return redirect(url_for('view_topic', topic_id=topic.id) + '#comments')
+                return redirect(url_for('view_topic', topic_id=topic.id, page='last') + '#comments')
 
             except Exception as e:
                  db.session.rollback()
@@ -291,11 +420,7 @@ def view_topic(topic_id):
             flash('Чтобы оставить комментарий, пожалуйста, войдите.', 'error')
             return redirect(url_for('login'))
 
-    comments = db.session.scalars(
-        sa.select(CommentTopic)
-        .where(CommentTopic.topic_id == topic.id)
-        .order_by(CommentTopic.timestamp.asc()) 
-    ).all()
+    comments = topic_comments(topic.id, last=request.args.get('page') == 'last')
 
     return render_template(
         'view_topic.html',
@@ -305,6 +430,42 @@ def view_topic(topic_id):
         form=form 
     )
 
+
+def topic_comments(topic_id, last=False):
+    return paginate_keyset(
+        sa.select(CommentTopic)
+        .options(author_summary(CommentTopic.author))
+        .where(CommentTopic.topic_id == topic_id),
+        CommentTopic.timestamp, CommentTopic.id,
+        per_page=application.config.get('COMMENTS_PER_PAGE', 50),
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        descending=False,
+        last=last
+    )
+
+
+@application.route('/view_topic/<int:topic_id>/comments')
+@login_required
+def topic_comments_json(topic_id):
+    db.first_or_404(sa.select(ForumTopic.id).where(ForumTopic.id == topic_id))
+    comments = topic_comments(topic_id)
+    return {
+        'comments': [
+            {
+                'id': comment.id,
+                'author': comment.author.username,
+                'body': comment.body,
+                'timestamp': comment.timestamp.replace(tzinfo=comment.timestamp.tzinfo or timezone.utc).isoformat(),
+                'date': format_datetime(comment.timestamp)
+            }
+            for comment in comments
+        ],
+        'next': url_for('topic_comments_json', topic_id=topic_id, after=comments.next_cursor)
+                if comments.has_next else None
+    }
+
+
 @application.route('/follow/<username>', methods=['POST'])
 @login_required 
 def follow(username):
@@ -319,9 +480,11 @@ def follow(username):
             flash('Вы не можете подписаться на самого себя!', 'warning')
             return redirect(url_for('profile', username=username))
 
-        current_user.follow(user)
-        db.session.commit()
-        flash(f'Вы подписались на пользователя {username}!', 'message')
+        if follows.follow(current_user, user):
+            db.session.commit()
+            flash(f'Вы подписались на пользователя {username}!', 'message')
+        else:
+            flash(f'Вы уже подписаны на пользователя {username}.', 'message')
 
     else:
         flash('Произошла ошибка при подписке.', 'error')
@@ -343,9 +506,11 @@ def unfollow(username):
             flash('Вы не можете отписаться от самого себя!', 'warning')
             return redirect(url_for('profile', username=username))
 
-        current_user.unfollow(user) 
-        db.session.commit()
-        flash(f'Вы отписались от пользователя {username}.', 'message')
+        if follows.unfollow(current_user, user):
+            db.session.commit()
+            flash(f'Вы отписались от пользователя {username}.', 'message')
+        else:
+            flash(f'Вы не подписаны на пользователя {username}.', 'message')
     else:
         flash('Произошла ошибка при отписке.', 'error')
 
@@ -0,0 +1,398 @@
+from collections import defaultdict
+import math
+import re
+import threading
+import sqlalchemy as sa
+import sqlalchemy.orm as so
+from markupsafe import Markup, escape
+from app import application, db
+from app.models import ForumTopic, CommentTopic
+from app.generations import bump_generation, read_generation
+from app.stemmer import stem
+
+
+WORD = re.compile(r'\w+')
+TITLE_WEIGHT = 3.0
+SNIPPET_WORDS = 30
+
+
+def tokenize(text):
+    return [stem(word) for word in WORD.findall(text or '')]
+
+
+def query_terms(query):
+    return list(dict.fromkeys(term for term in tokenize(query) if term))
+
+
+def _document(kind, obj):
+    if kind == 'topic':
+        return ('topic', obj.id, obj.id, ' '.join(tokenize(obj.title)), ' '.join(tokenize(obj.body)))
+    return ('comment', obj.id, obj.topic_id, '', ' '.join(tokenize(obj.body)))
+
+
+def _rowid(kind, ref_id):
+    return ref_id * 2 + (kind == 'comment')
+
+
+def _iter_documents(connection):
+    topics = sa.select(ForumTopic.id, ForumTopic.title, ForumTopic.body)
+    for topic in connection.execute(topics.execution_options(yield_per=500)):
+        yield _document('topic', topic)
+    comments = sa.select(CommentTopic.id, CommentTopic.topic_id, CommentTopic.body)
+    for comment in connection.execute(comments.execution_options(yield_per=500)):
+        yield _document('comment', comment)
+
+
+class Fts5Backend:
+    name = 'fts5'
+    table = 'search_documents'
+    legacy_tables = ('search_index',)
+
+    def __init__(self):
+        self._ready = False
+
+    def _create(self, connection):
+        connection.exec_driver_sql(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5('
+            'kind UNINDEXED, ref_id UNINDEXED, topic_id UNINDEXED, title, body, '
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+
+    def _fill(self, connection):
+        batch = []
+        for document in _iter_documents(connection):
+            batch.append(document)
+            if len(batch) >= 500:
+                self._insert(connection, batch)
+                batch = []
+        self._insert(connection, batch)
+        bump_generation(connection, self.name)
+
+    def _insert(self, connection, documents):
+        if documents:
+            connection.exec_driver_sql(
+                f'INSERT OR REPLACE INTO {self.table} (rowid, kind, ref_id, topic_id, title, body) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [(_rowid(document[0], document[1]), *document) for document in documents]
+            )
+
+    def ensure_index(self):
+        if self._ready:
+            return
+
+        with db.engine.begin() as connection:
+            self._create(connection)
+            if not read_generation(connection, self.name):
+                for table in self.legacy_tables:
+                    connection.exec_driver_sql(f'DROP TABLE IF EXISTS {table}')
+                self._fill(connection)
+        self._ready = True
+
+    def apply(self, connection, upserts, deletes):
+        if not self._ready:
+            self._create(connection)
+        for kind, ref_id in deletes:
+            connection.exec_driver_sql(f'DELETE FROM {self.table} WHERE rowid = ?', (_rowid(kind, ref_id),))
+            if kind == 'topic':
+                connection.exec_driver_sql(f"DELETE FROM {self.table} WHERE kind = 'comment' AND topic_id = ?",
+                                           (ref_id,))
+        self._insert(connection, upserts)
+
+    def commit(self, upserts, deletes, generations=None):
+        pass
+
+    def rebuild(self, session):
+        connection = session.connection()
+        for table in (self.table, *self.legacy_tables):
+            connection.exec_driver_sql(f'DROP TABLE IF EXISTS {table}')
+        self._create(connection)
+        self._fill(connection)
+        session.commit()
+        self._ready = True
+
+    def _match(self, terms):
+        return ' AND '.join(f'"{term}"*' for term in terms)
+
+    def search(self, terms, offset, limit):
+        self.ensure_index()
+        connection = db.session.connection()
+        rows = connection.exec_driver_sql(
+            'SELECT topic_id, MIN(score) AS best FROM ('
+            f'SELECT topic_id, bm25({self.table}, 0, 0, 0, {TITLE_WEIGHT}, 1.0) AS score '
+            f'FROM {self.table} WHERE {self.table} MATCH ? LIMIT -1'
+            ') GROUP BY topic_id ORDER BY best, topic_id DESC LIMIT ? OFFSET ?',
+            (self._match(terms), limit, offset)
+        ).all()
+        return [row[0] for row in rows]
+
+    def matching_comments(self, terms, topic_ids):
+        if not topic_ids:
+            return {}
+
+        connection = db.session.connection()
+        placeholders = ', '.join('?' for _ in topic_ids)
+        rows = connection.exec_driver_sql(
+            f'SELECT topic_id, ref_id FROM {self.table} WHERE {self.table} MATCH ? '
+            f"AND kind = 'comment' AND topic_id IN ({placeholders}) ORDER BY rank",
+            (self._match(terms), *topic_ids)
+        ).all()
+
+        matches = {}
+        for topic_id, ref_id in rows:
+            matches.setdefault(topic_id, ref_id)
+        return matches
+
+
+class MemoryBackend:
+    name = 'memory'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._documents = None
+        self._postings = defaultdict(set)
+        self._generation = None
+
+    def _index(self, document):
+        kind, ref_id, topic_id, title, body = document
+        frequencies = defaultdict(float)
+        for term in title.split():
+            frequencies[term] += TITLE_WEIGHT
+        for term in body.split():
+            frequencies[term] += 1.0
+
+        self._documents[(kind, ref_id)] = (topic_id, frequencies)
+        for term in frequencies:
+            self._postings[term].add((kind, ref_id))
+
+    def _remove(self, key):
+        entry = self._documents.pop(key, None)
+        if entry is not None:
+            for term in entry[1]:
+                self._postings[term].discard(key)
+
+    def _load(self):
+        connection = db.session.connection()
+        generation = read_generation(connection, self.name)
+        if self._documents is not None and generation == self._generation:
+            return
+
+        self._documents = {}
+        self._postings.clear()
+        self._generation = generation
+        for document in _iter_documents(connection):
+            self._index(document)
+
+    def ensure_index(self):
+        pass
+
+    def apply(self, connection, upserts, deletes):
+        return bump_generation(connection, self.name)
+
+    def commit(self, upserts, deletes, generations=None):
+        with self._lock:
+            if self._documents is None:
+                return
+            if generations is None or generations[0] != self._generation:
+                self._documents = None
+                return
+
+            self._generation = generations[1]
+            for kind, ref_id in deletes:
+                self._remove((kind, ref_id))
+                if kind == 'topic':
+                    for key, entry in list(self._documents.items()):
+                        if key[0] == 'comment' and entry[0] == ref_id:
+                            self._remove(key)
+            for document in upserts:
+                self._remove((document[0], document[1]))
+            for document in upserts:
+                self._index(document)
+
+    def rebuild(self, session):
+        with self._lock:
+            self._documents = None
+            self._load()
+
+    def _scores(self, terms):
+        total = len(self._documents) or 1
+        scores = None
+        for term in terms:
+            term_scores = defaultdict(float)
+            for indexed_term in [t for t in self._postings if t.startswith(term)]:
+                postings = self._postings[indexed_term]
+                idf = math.log(1 + total / (1 + len(postings)))
+                for key in postings:
+                    term_scores[key] += self._documents[key][1][indexed_term] * idf
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {key: scores[key] + value for key, value in term_scores.items() if key in scores}
+        return scores or {}
+
+    def search(self, terms, offset, limit):
+        with self._lock:
+            self._load()
+            best = defaultdict(float)
+            for key, score in self._scores(terms).items():
+                topic_id = self._documents[key][0]
+                best[topic_id] = max(best[topic_id], score)
+
+        ranked = sorted(best.items(), key=lambda item: (-item[1], -item[0]))
+        return [topic_id for topic_id, _ in ranked[offset:offset + limit]]
+
+    def matching_comments(self, terms, topic_ids):
+        with self._lock:
+            self._load()
+            matches = {}
+            scores = sorted(self._scores(terms).items(), key=lambda item: -item[1])
+            for (kind, ref_id), _ in scores:
+                topic_id = self._documents[(kind, ref_id)][0]
+                if kind == 'comment' and topic_id in topic_ids:
+                    matches.setdefault(topic_id, ref_id)
+        return matches
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        choice = application.config.get('SEARCH_BACKEND', 'auto')
+        if choice == 'auto':
+            choice = 'fts5' if db.engine.dialect.name == 'sqlite' and _fts5_available() else 'memory'
+        _backend = Fts5Backend() if choice == 'fts5' else MemoryBackend()
+    return _backend
+
+
+def _fts5_available():
+    with db.engine.connect() as connection:
+        try:
+            connection.exec_driver_sql('CREATE VIRTUAL TABLE temp._fts5_probe USING fts5(x)')
+            connection.exec_driver_sql('DROP TABLE temp._fts5_probe')
+            return True
+        except sa.exc.OperationalError:
+            return False
+
+
+def search_topic_ids(query, offset, limit):
+    terms = query_terms(query)
+    if not terms:
+        return [], False
+
+    topic_ids = get_backend().search(terms, offset, limit + 1)
+    return topic_ids[:limit], len(topic_ids) > limit
+
+
+def prepare_index():
+    get_backend().ensure_index()
+
+
+def rebuild_index():
+    get_backend().rebuild(db.session)
+
+
+def _highlight(text, terms):
+    words = list(WORD.finditer(text or ''))
+    terms = tuple(terms)
+    first_hit = next((i for i, match in enumerate(words) if stem(match.group()).startswith(terms)), None)
+    if first_hit is None:
+        return None
+
+    first = max(first_hit - SNIPPET_WORDS // 3, 0)
+    last = min(first + SNIPPET_WORDS, len(words))
+    hit_set = {i for i in range(first, last) if stem(words[i].group()).startswith(terms)}
+
+    parts = ['…' if first > 0 else '']
+    position = words[first].start()
+    for i in range(first, last):
+        match = words[i]
+        parts.append(str(escape(text[position:match.start()])))
+        if i in hit_set:
+            parts.append(f'<mark>{escape(match.group())}</mark>')
+        else:
+            parts.append(str(escape(match.group())))
+        position = match.end()
+    parts.append('…' if last < len(words) else str(escape(text[position:])))
+    return Markup(''.join(parts))
+
+
+def snippets(query, topics):
+    terms = query_terms(query)
+    result = {}
+    missing = []
+    for topic in topics:
+        snippet = _highlight(topic.body, terms)
+        if snippet is None:
+            missing.append(topic.id)
+        result[topic.id] = snippet
+
+    if missing and terms:
+        comment_ids = get_backend().matching_comments(terms, missing)
+        if comment_ids:
+            bodies = dict(db.session.execute(
+                sa.select(CommentTopic.id, CommentTopic.body).where(CommentTopic.id.in_(comment_ids.values()))
+            ).all())
+            for topic_id, comment_id in comment_ids.items():
+                result[topic_id] = _highlight(bodies.get(comment_id), terms)
+
+    return result
+
+
+def _text_changed(obj):
+    state = sa.inspect(obj)
+    return any(state.attrs[name].history.has_changes()
+               for name in ('title', 'body', 'topic_id') if name in state.attrs)
+
+
+def _pending(session):
+    return session.info.setdefault('search_changes', ({}, set()))
+
+
+@sa.event.listens_for(so.Session, 'after_flush')
+def _collect_changes(session, flush_context):
+    upserts, deletes = {}, set()
+    for obj in list(session.new) + [obj for obj in session.dirty if _text_changed(obj)]:
+        if isinstance(obj, ForumTopic):
+            upserts[('topic', obj.id)] = _document('topic', obj)
+        elif isinstance(obj, CommentTopic):
+            upserts[('comment', obj.id)] = _document('comment', obj)
+    for obj in session.deleted:
+        if isinstance(obj, ForumTopic):
+            deletes.add(('topic', obj.id))
+        elif isinstance(obj, CommentTopic):
+            deletes.add(('comment', obj.id))
+
+    _queue_changes(session, upserts, deletes)
+
+
+def _queue_changes(session, upserts, deletes):
+    if not upserts and not deletes:
+        return
+
+    generation = get_backend().apply(session.connection(), list(upserts.values()), deletes)
+    if generation is not None:
+        first = session.info.get('search_generation', (generation - 1,))[0]
+        session.info['search_generation'] = (first, generation)
+
+    pending_upserts, pending_deletes = _pending(session)
+    pending_upserts.update(upserts)
+    pending_deletes.update(deletes)
+
+
+def remove_documents(session, kind, ids):
+    _queue_changes(session, {}, {(kind, ref_id) for ref_id in ids})
+
+
+@sa.event.listens_for(so.Session, 'after_commit')
+def _commit_changes(session):
+    upserts, deletes = session.info.pop('search_changes', ({}, set()))
+    generations = session.info.pop('search_generation', None)
+    if upserts or deletes:
+        get_backend().commit(list(upserts.values()), deletes, generations)
+
+
+@sa.event.listens_for(so.Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop('search_changes', None)
+    session.info.pop('search_generation', None)
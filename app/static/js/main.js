@@ -17,4 +17,59 @@ document.addEventListener('DOMContentLoaded', function() {
         shape.ondragstart = function() { return false; };
         shape.onselectstart = function() { return false; };
     });
-});
\ No newline at end of file
+});
+
+document.addEventListener('DOMContentLoaded', function() {
+    const button = document.querySelector('.load-more-comments');
+    if (!button) {
+        return;
+    }
+
+    const list = document.querySelector('.comments-list');
+    const pagerNext = button.parentElement.querySelector('.pager-next');
+    if (pagerNext) {
+        pagerNext.style.display = 'none';
+    }
+
+    function renderComment(comment) {
+        const item = document.createElement('div');
+        item.className = 'comment-item review-item';
+
+        const meta = document.createElement('p');
+        meta.className = 'comment-meta review-meta';
+        const author = document.createElement('span');
+        author.className = 'comment-author reviewer-name';
+        author.textContent = comment.author;
+        const date = document.createElement('span');
+        date.className = 'comment-date review-date';
+        date.textContent = comment.date;
+        meta.append(author, ' ', date);
+
+        const text = document.createElement('div');
+        text.className = 'comment-text review-text';
+        const body = document.createElement('p');
+        body.textContent = comment.body;
+        text.appendChild(body);
+
+        item.append(meta, text);
+        return item;
+    }
+
+    button.addEventListener('click', function() {
+        button.disabled = true;
+        fetch(button.dataset.url, {headers: {'Accept': 'application/json'}, credentials: 'same-origin'})
+            .then(response => response.json())
+            .then(data => {
+                data.comments.forEach(comment => list.appendChild(renderComment(comment)));
+                if (data.next) {
+                    button.dataset.url = data.next;
+                    button.disabled = false;
+                } else {
+                    button.remove();
+                }
+            })
+            .catch(() => {
+                button.disabled = false;
+            });
+    });
+});
@@ -0,0 +1,101 @@
+from functools import lru_cache
+import re
+
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND_1 = ('в', 'вши', 'вшись')
+PERFECTIVE_GERUND_2 = ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись')
+ADJECTIVE = ('ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем', 'им', 'ым', 'ом',
+             'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею')
+PARTICIPLE_1 = ('ем', 'нн', 'вш', 'ющ', 'щ')
+PARTICIPLE_2 = ('ивш', 'ывш', 'ующ')
+REFLEXIVE = ('ся', 'сь')
+VERB_1 = ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет', 'ют', 'ны', 'ть', 'ешь', 'нно')
+VERB_2 = ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй', 'ил', 'ыл', 'им', 'ым', 'ен',
+          'ило', 'ыло', 'ено', 'ят', 'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю')
+NOUN = ('а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и', 'ией', 'ей', 'ой', 'ий', 'й',
+        'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я')
+SUPERLATIVE = ('ейш', 'ейше')
+DERIVATIONAL = ('ост', 'ость')
+
+RUSSIAN_WORD = re.compile('^[а-я]+$')
+
+
+def _endings(group_2, group_1=()):
+    endings = [(ending, False) for ending in group_2] + [(ending, True) for ending in group_1]
+    return sorted(endings, key=lambda item: len(item[0]), reverse=True)
+
+
+_PERFECTIVE_GERUND = _endings(PERFECTIVE_GERUND_2, PERFECTIVE_GERUND_1)
+_ADJECTIVE = _endings(ADJECTIVE)
+_PARTICIPLE = _endings(PARTICIPLE_2, PARTICIPLE_1)
+_REFLEXIVE = _endings(REFLEXIVE)
+_VERB = _endings(VERB_2, VERB_1)
+_NOUN = _endings(NOUN)
+_SUPERLATIVE = _endings(SUPERLATIVE)
+
+
+def _strip(word, endings):
+    for ending, after_a in endings:
+        if word.endswith(ending):
+            stem = word[:-len(ending)]
+            if after_a and not stem.endswith(('а', 'я')):
+                return None
+            return stem
+    return None
+
+
+def _region(word, start):
+    for i in range(start + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            return i + 1
+    return len(word)
+
+
+@lru_cache(maxsize=65536)
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    if not RUSSIAN_WORD.match(word):
+        return word
+
+    rv_start = next((i + 1 for i, char in enumerate(word) if char in VOWELS), None)
+    if rv_start is None:
+        return word
+
+    prefix, rv = word[:rv_start], word[rv_start:]
+
+    stripped = _strip(rv, _PERFECTIVE_GERUND)
+    if stripped is None:
+        rv = _strip(rv, _REFLEXIVE) or rv
+        stripped = _strip(rv, _ADJECTIVE)
+        if stripped is not None:
+            stripped = _strip(stripped, _PARTICIPLE) or stripped
+        else:
+            stripped = _strip(rv, _VERB)
+            if stripped is None:
+                stripped = _strip(rv, _NOUN)
+    if stripped is not None:
+        rv = stripped
+
+    if rv.endswith('и'):
+        rv = rv[:-1]
+
+    word = prefix + rv
+    r2 = _region(word, _region(word, 0))
+    for ending in DERIVATIONAL[::-1]:
+        if word.endswith(ending) and len(word) - len(ending) >= r2:
+            word = word[:-len(ending)]
+            break
+
+    prefix, rv = word[:rv_start], word[rv_start:]
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    else:
+        stripped = _strip(rv, _SUPERLATIVE)
+        if stripped is not None:
+            rv = stripped[:-1] if stripped.endswith('нн') else stripped
+        elif rv.endswith('ь'):
+            rv = rv[:-1]
+
+    return prefix + rv
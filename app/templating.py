@@ -0,0 +1,49 @@
+from datetime import timezone
+from functools import lru_cache
+from jinja2 import FileSystemBytecodeCache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+MONTHS = ('января', 'февраля', 'марта', 'апреля', 'мая', 'июня',
+          'июля', 'августа', 'сентября', 'октября', 'ноября', 'декабря')
+
+FORMATS = {
+    'LLL': '{day} {month} {year} г., {hour}:{minute:02d}',
+    'LL': '{day} {month} {year} г.',
+    'LT': '{hour}:{minute:02d}',
+}
+
+
+def display_timezone(name):
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.utc
+
+
+def make_datetime_filter(tz):
+    @lru_cache(maxsize=8192)
+    def format_datetime(value, fmt='LLL'):
+        if value is None:
+            return ''
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        value = value.astimezone(tz)
+        return FORMATS[fmt].format(day=value.day, month=MONTHS[value.month - 1], year=value.year,
+                                   hour=value.hour, minute=value.minute)
+
+    return format_datetime
+
+
+def init_templating(app, preload=True):
+    env = app.jinja_env
+    env.bytecode_cache = FileSystemBytecodeCache(app.config.get('JINJA_BYTECODE_CACHE_DIR'))
+
+    format_datetime = make_datetime_filter(display_timezone(app.config.get('DISPLAY_TIMEZONE', 'Europe/Moscow')))
+    env.filters['datetime'] = format_datetime
+
+    if preload:
+        for name in app.jinja_loader.list_templates():
+            if name.endswith('.html'):
+                env.get_template(name)
+
+    return format_datetime
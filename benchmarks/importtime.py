@@ -0,0 +1,96 @@
+import argparse
+from collections import defaultdict
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Время холодного импорта приложения по данным -X importtime.')
+    parser.add_argument('--module', default='app', help='импортируемый модуль')
+    parser.add_argument('--repeat', type=int, default=5, help='число запусков, берётся лучший')
+    parser.add_argument('--budget-ms', type=float, default=1500, help='допустимое время импорта модуля')
+    parser.add_argument('--forbid', action='append', default=[],
+                        help='модуль, который не должен загружаться при импорте (можно повторять)')
+    parser.add_argument('--env', action='append', default=[], help='переменная окружения KEY=VALUE для запуска')
+    parser.add_argument('--top', type=int, default=15, help='сколько самых тяжёлых пакетов показать')
+    parser.add_argument('--json', action='store_true', help='вывести результат в JSON')
+    return parser.parse_args(argv)
+
+
+def measure(module, env):
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=ROOT, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-2000:])
+
+    modules = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return wall, modules
+
+
+def summarize(wall, modules, module, top):
+    packages = defaultdict(int)
+    for name, self_us, _, _ in modules:
+        packages[name.split('.')[0]] += self_us
+
+    target = next((cumulative for name, _, cumulative, _ in modules if name == module), 0)
+    heaviest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        'wall_ms': wall * 1000,
+        'import_ms': target / 1000,
+        'total_ms': sum(self_us for _, self_us, _, _ in modules) / 1000,
+        'modules': len(modules),
+        'packages': [{'package': name, 'ms': us / 1000} for name, us in heaviest],
+        'loaded': sorted({name for name, *_ in modules}),
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT, env.get('PYTHONPATH')]))
+    env.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='importtime-'), 'app.db'))
+    for item in args.env:
+        key, _, value = item.partition('=')
+        env[key] = value
+
+    runs = [summarize(*measure(args.module, env), args.module, args.top) for _ in range(args.repeat)]
+    best = min(runs, key=lambda run: run['import_ms'])
+    loaded = set(best.pop('loaded'))
+    forbidden = sorted(name for name in args.forbid if name in loaded)
+
+    if args.json:
+        print(json.dumps(dict(best, forbidden_loaded=forbidden), ensure_ascii=False, indent=2))
+    else:
+        print(f"импорт {args.module}: {best['import_ms']:.1f} мс (лучший из {args.repeat}), "
+              f"процесс целиком: {best['wall_ms']:.1f} мс, модулей: {best['modules']}")
+        for row in best['packages']:
+            print(f"  {row['package']:<28} {row['ms']:>8.1f} мс")
+
+    failed = False
+    if best['import_ms'] > args.budget_ms:
+        print(f"\nИмпорт дольше бюджета: {best['import_ms']:.1f} мс > {args.budget_ms:.0f} мс")
+        failed = True
+    if forbidden:
+        print('\nЗагружены запрещённые модули: ' + ', '.join(forbidden))
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,281 @@
+import argparse
+from http.cookiejar import CookieJar
+import json
+import multiprocessing
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Нагрузочный бенчмарк приложения на локальной SQLite базе.')
+    parser.add_argument('--database', help='путь к файлу SQLite (по умолчанию временный файл)')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--topics', type=int, default=2000)
+    parser.add_argument('--comments', type=int, default=10000)
+    parser.add_argument('--reviews', type=int, default=500)
+    parser.add_argument('--follows', type=int, default=10, help='подписок на пользователя')
+    parser.add_argument('--requests', type=int, default=50, help='запросов на маршрут через test client')
+    parser.add_argument('--http', action='store_true', help='дополнительно прогнать HTTP нагрузку')
+    parser.add_argument('--processes', type=int, default=4, help='процессов генератора нагрузки')
+    parser.add_argument('--http-requests', type=int, default=200, help='запросов на процесс')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='допустимый рост p95 относительно базы')
+    parser.add_argument('--json', action='store_true', help='вывести результат в JSON')
+    return parser.parse_args(argv)
+
+
+def percentiles(samples):
+    if len(samples) < 2:
+        value = samples[0] if samples else 0.0
+        return value, value, value
+    cuts = statistics.quantiles(samples, n=100, method='inclusive')
+    return cuts[49], cuts[94], cuts[98]
+
+
+def summarize(latencies, extra=None):
+    p50, p95, p99 = percentiles(latencies)
+    summary = {'count': len(latencies), 'p50_ms': p50 * 1000, 'p95_ms': p95 * 1000, 'p99_ms': p99 * 1000}
+    summary.update(extra or {})
+    return summary
+
+
+def routes(application, db):
+    import sqlalchemy as sa
+    from app.models import ForumTopic
+
+    with application.app_context():
+        busiest = db.session.scalar(sa.select(ForumTopic.id).order_by(ForumTopic.comment_count.desc()).limit(1))
+
+    return {
+        'forum': '/forum',
+        'forum_subscribed': '/forum?filter=subscribed',
+        'search_topics': '/search_topics?q=' + urllib.parse.quote('программирование'),
+        'view_topic': f'/view_topic/{busiest}',
+        'profile': '/profile/user2',
+        'reviews': '/reviews',
+    }
+
+
+def run_test_client(application, db, paths, requests):
+    import sqlalchemy as sa
+    from benchmarks.seed import PASSWORD
+
+    queries = []
+
+    def count_query(*args):
+        queries.append(1)
+
+    with application.app_context():
+        engine = db.engine
+    sa.event.listen(engine, 'before_cursor_execute', count_query)
+
+    client = application.test_client()
+    client.post('/login', data={'username': 'user1', 'password': PASSWORD})
+
+    results = {}
+    for name, path in paths.items():
+        client.get(path)
+        latencies, query_counts, sizes = [], [], []
+        for _ in range(requests):
+            queries.clear()
+            started = time.perf_counter()
+            response = client.get(path)
+            latencies.append(time.perf_counter() - started)
+            query_counts.append(len(queries))
+            sizes.append(len(response.get_data()))
+            if response.status_code != 200:
+                raise RuntimeError(f'{path} вернул {response.status_code}')
+
+        total = sum(latencies)
+        results[name] = summarize(latencies, {
+            'throughput_rps': len(latencies) / total if total else 0.0,
+            'queries': max(query_counts),
+            'bytes': int(statistics.mean(sizes)),
+        })
+
+    sa.event.remove(engine, 'before_cursor_execute', count_query)
+    return results
+
+
+def use_database(database):
+    uri = 'sqlite:///' + os.path.abspath(database)
+    os.environ['DATABASE_URL'] = uri
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+
+    from config import Config
+    Config.SQLALCHEMY_DATABASE_URI = uri
+
+    from app import application, db
+    with application.app_context():
+        url = db.engine.url
+    if url.get_backend_name() != 'sqlite' or not url.database \
+            or os.path.abspath(url.database) != os.path.abspath(database):
+        raise SystemExit(f'Приложение подключено к {url.render_as_string(hide_password=True)}, '
+                         f'а не к {os.path.abspath(database)}. Бенчмарк остановлен, '
+                         f'чтобы не удалить рабочую базу.')
+    return application, db
+
+
+def _serve(port, database):
+    import logging
+    from werkzeug.serving import make_server
+
+    application, _ = use_database(database)
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    application.config['WTF_CSRF_ENABLED'] = False
+    make_server('127.0.0.1', port, application, threaded=True).serve_forever()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _http_worker(args):
+    from benchmarks.seed import PASSWORD
+
+    base_url, paths, requests, worker = args
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+    login = urllib.parse.urlencode({'username': f'user{worker + 1}', 'password': PASSWORD}).encode()
+    opener.open(base_url + '/login', data=login).read()
+
+    names = list(paths)
+    samples = {name: [] for name in names}
+    sizes = {name: 0 for name in names}
+    for i in range(requests):
+        name = names[i % len(names)]
+        started = time.perf_counter()
+        with opener.open(base_url + paths[name]) as response:
+            body = response.read()
+        samples[name].append(time.perf_counter() - started)
+        sizes[name] += len(body)
+    return samples, sizes
+
+
+def run_http(database, paths, processes, requests):
+    port = _free_port()
+    server = multiprocessing.Process(target=_serve, args=(port, database), daemon=True)
+    server.start()
+
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            urllib.request.urlopen(base_url + '/index').read()
+            break
+        except OSError:
+            if time.monotonic() > deadline:
+                server.terminate()
+                raise
+            time.sleep(0.1)
+
+    try:
+        started = time.perf_counter()
+        with multiprocessing.Pool(processes) as pool:
+            outcomes = pool.map(_http_worker, [(base_url, paths, requests, i) for i in range(processes)])
+        elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.join()
+
+    results = {}
+    for name in paths:
+        latencies = [sample for samples, _ in outcomes for sample in samples[name]]
+        size = sum(sizes[name] for _, sizes in outcomes)
+        results[name] = summarize(latencies, {'bytes': int(size / len(latencies)) if latencies else 0})
+
+    total = sum(result['count'] for result in results.values())
+    return {'routes': results, 'throughput_rps': total / elapsed if elapsed else 0.0, 'processes': processes}
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, current in results['test_client'].items():
+        previous = baseline.get('test_client', {}).get(name)
+        if previous is None:
+            continue
+        if current['queries'] > previous['queries']:
+            regressions.append(f"{name}: запросов к БД {previous['queries']} -> {current['queries']}")
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']:.1f} мс -> {current['p95_ms']:.1f} мс")
+    return regressions
+
+
+def print_report(results):
+    print(f"{'маршрут':<18} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9} {'rps':>8} {'SQL':>5} {'байт':>9}")
+    for name, row in results['test_client'].items():
+        print(f"{name:<18} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} "
+              f"{row['throughput_rps']:>8.1f} {row['queries']:>5} {row['bytes']:>9}")
+
+    if 'http' in results:
+        http = results['http']
+        print(f"\nHTTP, процессов: {http['processes']}, всего {http['throughput_rps']:.1f} rps")
+        for name, row in http['routes'].items():
+            print(f"{name:<18} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} "
+                  f"{'':>8} {'':>5} {row['bytes']:>9}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    database = args.database or os.path.join(tempfile.mkdtemp(prefix='benchmark-'), 'benchmark.db')
+    application, db = use_database(database)
+    from benchmarks.seed import seed
+
+    application.config['WTF_CSRF_ENABLED'] = False
+
+    with application.app_context():
+        seed(db, users=args.users, topics=args.topics, comments=args.comments,
+             reviews=args.reviews, follows=args.follows)
+
+    paths = routes(application, db)
+    results = {
+        'dataset': {'users': args.users, 'topics': args.topics, 'comments': args.comments,
+                    'reviews': args.reviews, 'follows': args.follows},
+        'test_client': run_test_client(application, db, paths, args.requests),
+    }
+    if args.http:
+        results['http'] = run_http(database, paths, args.processes, args.http_requests)
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print_report(results)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('dataset') != results['dataset']:
+            print('\nБазовый результат снят на другом наборе данных, сравнение пропущено.')
+            return 0
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print('\nРегрессии относительно базы:')
+            for line in regressions:
+                print('  ' + line)
+            return 1
+        print('\nРегрессий относительно базы нет.')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta, timezone
+import random
+import sqlalchemy as sa
+from werkzeug.security import generate_password_hash
+
+WORDS = (
+    'питон фласк сайт программирование база данных запрос шаблон форум тема ответ '
+    'проект отзыв сервер клиент страница стиль скрипт код ошибка решение вопрос '
+    'пользователь профиль подписка поиск индекс кэш производительность тест'
+).split()
+
+PASSWORD = 'benchmark'
+
+
+def _text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def seed(db, users=50, topics=2000, comments=10000, reviews=500, follows=10, seed_value=42):
+    from app.models import User, ForumTopic, CommentTopic, ReviewsMessage, followers
+    from app.counters import reconcile_topic_counters
+    from app.follows import reconcile_follow_counts
+    from app import search
+
+    rng = random.Random(seed_value)
+    start = datetime.now(timezone.utc) - timedelta(days=365)
+    password_hash = generate_password_hash(PASSWORD)
+
+    db.drop_all()
+    db.create_all()
+
+    db.session.execute(sa.insert(User), [
+        {'id': i, 'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': password_hash,
+         'about_me': _text(rng, 8), 'last_seen': start}
+        for i in range(1, users + 1)
+    ])
+
+    db.session.execute(sa.insert(followers), [
+        {'follower_id': follower, 'followed_id': followed}
+        for follower in range(1, users + 1)
+        for followed in rng.sample(range(1, users + 1), min(follows, users))
+        if followed != follower
+    ])
+
+    topic_times = sorted(start + timedelta(seconds=rng.randint(0, 365 * 86400)) for _ in range(topics))
+    db.session.execute(sa.insert(ForumTopic), [
+        {'id': i, 'title': _text(rng, 5), 'body': _text(rng, 120), 'timestamp': timestamp,
+         'last_activity_at': timestamp, 'user_id': rng.randint(1, users)}
+        for i, timestamp in enumerate(topic_times, start=1)
+    ])
+
+    hot_topics = list(range(1, topics + 1))
+    weights = [1.0 / (rank + 1) for rank in range(topics)]
+    db.session.execute(sa.insert(CommentTopic), [
+        {'body': _text(rng, 40), 'timestamp': start + timedelta(seconds=rng.randint(0, 365 * 86400)),
+         'user_id': rng.randint(1, users), 'topic_id': topic_id}
+        for topic_id in rng.choices(hot_topics, weights=weights, k=comments)
+    ])
+
+    db.session.execute(sa.insert(ReviewsMessage), [
+        {'body': _text(rng, 15)[:140], 'timestamp': start + timedelta(seconds=rng.randint(0, 365 * 86400)),
+         'user_id': rng.randint(1, users), 'username_message': f'user{rng.randint(1, users)}'}
+        for _ in range(reviews)
+    ])
+    db.session.commit()
+
+    reconcile_topic_counters()
+    reconcile_follow_counts()
+    search.rebuild_index()
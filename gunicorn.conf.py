@@ -0,0 +1,19 @@
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:80')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+keepalive = 5
+max_requests = 2000
+max_requests_jitter = 200
+preload_app = True
+wsgi_app = 'wsgi:app'
+accesslog = '-'
+
+
+def post_fork(server, worker):
+    from wsgi import dispose_engine
+    dispose_engine()
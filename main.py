@@ -1,5 +1,3 @@
-import sqlalchemy as sa
-import sqlalchemy.orm as so
 from app import application, db
 from app.models import User
 
@@ -8,4 +6,6 @@ if __name__ == "__main__":
 
 @application.shell_context_processor
 def make_shell_context():
-    return {'sa': sa, 'so': so, 'db': db, 'User': User}
\ No newline at end of file
+    import sqlalchemy as sa
+    import sqlalchemy.orm as so
+    return {'sa': sa, 'so': so, 'db': db, 'User': User}
@@ -0,0 +1,49 @@
+import os
+import sys
+import tempfile
+import types
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = tempfile.mkdtemp(prefix='microblog-tests-')
+
+
+class Config:
+    SECRET_KEY = 'tests'
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(DATA_DIR, 'app.db')
+    WTF_CSRF_ENABLED = False
+    LOG_DIR = os.path.join(DATA_DIR, 'logs')
+    PAGE_CACHE_ENABLED = False
+    AVATAR_ASYNC = False
+    MIGRATE_ENABLED = False
+    ADMIN_ENABLED = False
+
+
+sys.path.insert(0, ROOT)
+sys.modules['config'] = types.ModuleType('config')
+sys.modules['config'].Config = Config
+
+PASSWORD = 'tests'
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import application, db
+    from app.models import User
+
+    with application.app_context():
+        db.create_all()
+        user = User(username='reader', email='reader@example.com')
+        user.set_password(PASSWORD)
+        db.session.add(user)
+        db.session.commit()
+
+    yield application
+
+
+@pytest.fixture(scope='session')
+def client(app):
+    client = app.test_client()
+    response = client.post('/login', data={'username': 'reader', 'password': PASSWORD})
+    assert response.status_code == 302
+    return client
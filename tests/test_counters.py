@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+import pytest
+import sqlalchemy as sa
+
+
+def counters(topic_id):
+    from app import db
+    from app.models import ForumTopic
+
+    row = db.session.execute(
+        sa.select(ForumTopic.comment_count, ForumTopic.last_activity_at).where(ForumTopic.id == topic_id)
+    ).one()
+    return row.comment_count, row.last_activity_at.replace(tzinfo=None)
+
+
+@pytest.fixture
+def topic(app):
+    from app import db
+    from app.models import User, ForumTopic
+
+    with app.app_context():
+        reader = db.session.scalar(sa.select(User).where(User.username == 'reader'))
+        topic = ForumTopic(title='Счётчики', body='Проверка счётчиков', author=reader,
+                           timestamp=datetime(2024, 1, 1))
+        db.session.add(topic)
+        db.session.commit()
+        yield topic.id, reader.id
+
+
+def add_comment(topic_id, user_id, timestamp):
+    from app import db
+    from app.models import CommentTopic
+
+    comment = CommentTopic(body='Комментарий', topic_id=topic_id, user_id=user_id, timestamp=timestamp)
+    db.session.add(comment)
+    db.session.commit()
+    return comment.id
+
+
+def test_adding_comments_updates_counters(topic):
+    topic_id, user_id = topic
+    assert counters(topic_id) == (0, datetime(2024, 1, 1))
+
+    add_comment(topic_id, user_id, datetime(2024, 1, 3))
+    add_comment(topic_id, user_id, datetime(2024, 1, 2))
+
+    assert counters(topic_id) == (2, datetime(2024, 1, 3))
+
+
+def test_deleting_comments_recalculates_counters(topic):
+    from app import db
+    from app.models import CommentTopic
+    from app.moderation import delete_comments
+
+    topic_id, user_id = topic
+    first = add_comment(topic_id, user_id, datetime(2024, 1, 2))
+    second = add_comment(topic_id, user_id, datetime(2024, 1, 3))
+    third = add_comment(topic_id, user_id, datetime(2024, 1, 4))
+
+    db.session.delete(db.session.get(CommentTopic, third))
+    db.session.commit()
+    assert counters(topic_id) == (2, datetime(2024, 1, 3))
+
+    delete_comments([second])
+    assert counters(topic_id) == (1, datetime(2024, 1, 2))
+
+    delete_comments([first])
+    assert counters(topic_id) == (0, datetime(2024, 1, 1))
+
+
+def test_rolled_back_comment_leaves_counters_unchanged(topic):
+    from app import db
+    from app.models import CommentTopic
+
+    topic_id, user_id = topic
+    add_comment(topic_id, user_id, datetime(2024, 1, 2))
+
+    db.session.add(CommentTopic(body='Откат', topic_id=topic_id, user_id=user_id,
+                                timestamp=datetime(2024, 1, 2) + timedelta(days=5)))
+    db.session.flush()
+    assert counters(topic_id) == (2, datetime(2024, 1, 7))
+    db.session.rollback()
+
+    assert counters(topic_id) == (1, datetime(2024, 1, 2))
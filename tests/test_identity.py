@@ -0,0 +1,62 @@
+import pytest
+import sqlalchemy as sa
+
+PASSWORD = 'banned'
+
+
+@pytest.fixture
+def member(app):
+    from app import db
+    from app.identity import invalidate_identity
+    from app.models import User
+
+    with app.app_context():
+        user = User(username='member', email='member@example.com')
+        user.set_password(PASSWORD)
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    client = app.test_client()
+    response = client.post('/login', data={'username': 'member', 'password': PASSWORD})
+    assert response.status_code == 302
+
+    yield user_id, client
+
+    with app.app_context():
+        db.session.execute(sa.delete(User).where(User.id == user_id))
+        db.session.commit()
+    invalidate_identity(user_id)
+
+
+def test_bulk_ban_evicts_cached_identity(app, member):
+    from app.identity import identity_cache
+    from app.moderation import set_banned
+
+    user_id, client = member
+    assert client.get('/forum').status_code == 200
+    assert identity_cache.get(user_id) is not None
+
+    with app.app_context():
+        assert set_banned([user_id]) == 1
+    assert identity_cache.get(user_id) is None
+
+    response = client.get('/forum')
+    assert response.status_code == 302
+    assert '/login' in response.location
+
+
+def test_orm_ban_evicts_cached_identity(app, member):
+    from app import db
+    from app.identity import identity_cache
+    from app.models import User
+
+    user_id, client = member
+    assert client.get('/forum').status_code == 200
+
+    with app.app_context():
+        db.session.get(User, user_id).is_banned = True
+        db.session.commit()
+    assert identity_cache.get(user_id) is None
+
+    assert client.get('/forum').status_code == 302
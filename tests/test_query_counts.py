@@ -0,0 +1,74 @@
+import itertools
+import urllib.parse
+import pytest
+import sqlalchemy as sa
+
+_authors = itertools.count(1)
+
+
+def add_authors_content(topic_id, count):
+    from app import db
+    from app.models import User, ForumTopic, CommentTopic
+
+    for _ in range(count):
+        number = next(_authors)
+        author = User(username=f'author{number}', email=f'author{number}@example.com')
+        db.session.add(author)
+        db.session.flush()
+        db.session.add(ForumTopic(title=f'Тема про кэш {number}', body='Обсуждаем кэш и запросы', author=author))
+        db.session.add(CommentTopic(body=f'Комментарий про кэш {number}', user_id=author.id, topic_id=topic_id))
+    db.session.commit()
+
+
+def count_queries(app, client, path):
+    from app import db
+
+    queries = []
+
+    def count(*args):
+        queries.append(1)
+
+    with app.app_context():
+        engine = db.engine
+    sa.event.listen(engine, 'before_cursor_execute', count)
+    try:
+        response = client.get(path)
+    finally:
+        sa.event.remove(engine, 'before_cursor_execute', count)
+
+    assert response.status_code == 200
+    return len(queries)
+
+
+@pytest.fixture(scope='module')
+def topic_id(app):
+    from app import db
+    from app.models import User, ForumTopic
+
+    with app.app_context():
+        reader = db.session.scalar(sa.select(User).where(User.username == 'reader'))
+        topic = ForumTopic(title='Тема для комментариев про кэш', body='Кэш страниц', author=reader)
+        db.session.add(topic)
+        db.session.commit()
+        return topic.id
+
+
+@pytest.mark.parametrize('path, expected', [
+    ('/forum', 3),
+    ('/search_topics?q=' + urllib.parse.quote('кэш'), 4),
+    ('/view_topic/{topic_id}', 3),
+])
+def test_query_count_does_not_grow_with_authors(app, client, topic_id, path, expected):
+    path = path.format(topic_id=topic_id)
+
+    with app.app_context():
+        add_authors_content(topic_id, 3)
+    client.get(path)
+    few = count_queries(app, client, path)
+
+    with app.app_context():
+        add_authors_content(topic_id, 30)
+    client.get(path)
+    many = count_queries(app, client, path)
+
+    assert few == many == expected
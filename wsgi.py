@@ -0,0 +1,18 @@
+import os
+
+os.environ.setdefault('MIGRATE_ENABLED', '0')
+os.environ.setdefault('LOG_ROTATION', 'external')
+
+from app import application, db, search
+from app.avatars import mark_legacy_avatars
+
+app = application
+
+with application.app_context():
+    search.prepare_index()
+    mark_legacy_avatars()
+
+
+def dispose_engine():
+    with application.app_context():
+        db.engine.dispose(close=False)